@@ -1,8 +1,12 @@
+from audio.encoder import UPLOAD_CODECS, encode_speech
+from contextlib import nullcontext
+from utils import metrics
 from utils.define import *
 from openai import OpenAI, OpenAIError
-from typing import List, Dict
+from typing import BinaryIO, List, Dict, Union
 
 import asyncio
+import io
 import logging
 import os
 import time
@@ -19,6 +23,8 @@ class ConversationClient:
         self.audio_player = None
         self.server = None
         self.tasks = set()
+        self.partial_tasks = []  # In-order transcriptions of the segments of the current question
+        self.upload_codec = "flac"  # How recorded PCM is encoded for Whisper (audio/encoder.py)
         self.gptContext = {"role": "system", "content": """あなたは役立つアシスタントです。日本語で返答してください。
             ユーザーが薬を飲んだかどうか一度だけぜひ確認してください。確認後は、他の話題に移ってください。
             会話が自然に終了したと判断した場合は、返答の最後に '[END_OF_CONVERSATION]' というタグを付けてください。
@@ -31,6 +37,12 @@ class ConversationClient:
     def set_display(self, display):
         self.display = display
 
+    def set_upload_codec(self, codec):
+        if codec not in UPLOAD_CODECS:
+            openai_logger.warning(f"Unknown upload codec '{codec}', keeping {self.upload_codec}")
+            return
+        self.upload_codec = codec
+
     async def cleanup_tasks(self):
         """Clean up any running tasks"""
         for task in self.tasks:
@@ -80,11 +92,37 @@ class ConversationClient:
                     openai_logger.error(f"OpenAI API error: {e}")
                     return "申し訳ありません。エラーが発生しました。"
 
-    def speech_to_text(self, audio_file_path: str) -> str:
+    def _open_audio(self, audio):
+        """Return a readable audio file context for a path, raw 16-bit PCM or an in-memory WAV
+
+        Raw PCM is encoded with upload_codec.
+        """
+        if isinstance(audio, (str, os.PathLike)):
+            return open(audio, "rb")
+        if isinstance(audio, io.IOBase):
+            # Caller keeps ownership of its own buffer
+            audio.seek(0)
+            return nullcontext(audio)
+        return encode_speech(audio, codec=self.upload_codec, rate=RATE, channels=CHANNELS)
+
+    def speech_to_text(self, audio: Union[str, bytes, BinaryIO]) -> str:
+        """Transcribe a WAV file path, raw 16-bit PCM or a BytesIO-backed WAV
+
+        Returns the transcript, or a message to read back to the user when
+        nothing usable was recognised.
+        """
+        text, error_message = self._transcribe(audio)
+        return error_message if error_message else text
+
+    def _transcribe(self, audio: Union[str, bytes, BinaryIO]) -> tuple[str, str]:
+        """Return (transcript, None) or (None, message for the user)"""
+        started_at = time.monotonic()
         try:
-            # openai_logger.info(f"Processing speech audio file: {audio_file_path}")
+            # openai_logger.info(f"Processing speech audio file: {audio}")
+            metrics.increment('stt.requests')
             
-            with open(audio_file_path, "rb") as audio_file:
+            with self._open_audio(audio) as audio_file:
+                request_started_at = time.monotonic()
                 transcript = self.client.audio.transcriptions.create(
                     model="whisper-1",
                     file=audio_file,
@@ -96,6 +134,14 @@ class ConversationClient:
                         "「仕事」「安心」「大丈夫」「はい」「いいえ」などの一般的な言葉が使用される可能性が高いです。"
                     ),
                 )
+                # The SDK does not report when the body finished sending, so the
+                # upload is timed as the whole request (upload + recognition)
+                request_ms = (time.monotonic() - request_started_at) * 1000
+                metrics.observe('stt.request_ms', request_ms)
+                upload_name = getattr(audio_file, 'name', '')
+                if isinstance(audio_file, io.BytesIO):
+                    openai_logger.info(f"STT upload {upload_name}: {audio_file.getbuffer().nbytes} bytes, "
+                                       f"request {request_ms:.0f} ms")
 
                 if hasattr(transcript, 'segments') and transcript.segments:
                     segment = transcript.segments[0]
@@ -107,11 +153,11 @@ class ConversationClient:
                     
                     if segment.no_speech_prob > 0.95:  # Increased from 0.5
                         openai_logger.warning(f"No speech detected: {quality_info}")
-                        return "音声が検出できませんでした。もう一度お話しください。"
+                        return None, "音声が検出できませんでした。もう一度お話しください。"
                     
                     if segment.avg_logprob < -1.5:  
                         openai_logger.warning(f"Very low confidence transcription: {quality_info}")
-                        return "申し訳ありません。音声をはっきりと聞き取れませんでした。もう一度お話しいただけますか？"
+                        return None, "申し訳ありません。音声をはっきりと聞き取れませんでした。もう一度お話しいただけますか？"
                     
                     # Evaluate transcription quality
                     # if segment.avg_logprob < -1.0:
@@ -124,18 +170,71 @@ class ConversationClient:
 
                 if hasattr(transcript, 'text'):
                     transcribed_text = transcript.text.strip()
-                    return transcribed_text
+                    return transcribed_text, None
                 else:
                     raise ValueError("No text found in transcription response")
 
         except OpenAIError as e:
             error_msg = f"OpenAI API error during transcription: {str(e)}"
             openai_logger.error(error_msg)
-            return "音声の認識に問題が発生しました。もう一度お試しください。"
+            return None, "音声の認識に問題が発生しました。もう一度お試しください。"
         except Exception as e:
             error_msg = f"Unexpected error during transcription: {str(e)}"
             openai_logger.error(error_msg)
-            return "音声の認識に問題が発生しました。もう一度お試しください。"
+            return None, "音声の認識に問題が発生しました。もう一度お試しください。"
+        finally:
+            metrics.observe('stt.latency_ms', (time.monotonic() - started_at) * 1000)
+
+    def start_partial_transcript(self):
+        """Begin a question whose audio arrives segment by segment"""
+        self.cancel_partial_transcript()
+
+    def submit_segment(self, pcm: bytes):
+        """Transcribe one captured speech segment in the background, keeping segment order"""
+        metrics.increment('stt.segments')
+        task = asyncio.create_task(asyncio.to_thread(self._transcribe, pcm))
+        self.partial_tasks.append(task)
+
+    def partial_transcript(self):
+        """Joined transcript of the submitted segments once all are done, else None"""
+        if not self.partial_tasks or not all(task.done() for task in self.partial_tasks):
+            return None
+        texts = []
+        for task in self.partial_tasks:
+            if task.cancelled() or task.exception() is not None:
+                continue
+            text, _ = task.result()
+            if text:
+                texts.append(text)
+        return "".join(texts)
+
+    def cancel_partial_transcript(self):
+        for task in self.partial_tasks:
+            if not task.done():
+                task.cancel()
+        self.partial_tasks = []
+
+    async def finish_partial_transcript(self) -> str:
+        """Wait for the outstanding segments and return the joined transcript
+
+        Segments that failed are dropped; if none succeeded the first failure
+        message is returned, as speech_to_text would.
+        """
+        finished_at = time.monotonic()
+        tasks, self.partial_tasks = self.partial_tasks, []
+        texts = []
+        first_error = None
+        for text, error_message in await asyncio.gather(*tasks):
+            if text:
+                texts.append(text)
+            elif first_error is None:
+                first_error = error_message
+        # Only the last segment should still have been in flight when the user stopped
+        metrics.observe('stt.tail_ms', (time.monotonic() - finished_at) * 1000)
+
+        if not texts:
+            return first_error or "音声が検出できませんでした。もう一度お話しください。"
+        return "".join(texts)
 
     async def handle_error(self, error_message: str):
         """Handle errors with synchronized audio and gif playback"""
@@ -190,14 +289,23 @@ class ConversationClient:
         finally:
             await self.cleanup_tasks()
 
-    async def process_audio(self, input_audio_file: str) -> bool:
+    async def process_audio(self, input_audio: Union[str, bytes, BinaryIO], streamed: bool = False) -> bool:
+        """Reply to a recorded question
+
+        With streamed=True the question was already sent segment by segment
+        (submit_segment) and only the outstanding segments are awaited.
+        """
         try:
             # Generate output filename
-            base, ext = os.path.splitext(input_audio_file)
+            source_file = input_audio if isinstance(input_audio, str) else AIOutputAudio
+            base, ext = os.path.splitext(source_file)
             output_audio_file = f"{base}_response{ext}"
 
             # Speech-to-Text
-            stt_text = self.speech_to_text(input_audio_file)
+            if streamed:
+                stt_text = await self.finish_partial_transcript()
+            else:
+                stt_text = self.speech_to_text(input_audio)
             openai_logger.info(f"Transcript: {stt_text}")
 
             # LLM
@@ -0,0 +1,81 @@
+from utils import metrics
+
+import numpy as np
+import time
+
+class AutomaticGainControl:
+    """Streaming automatic gain control with a peak limiter for one audio stream
+
+    Per attack_ms block, the gain brings a fast-attack, release_ms envelope to
+    target_rms within [min_gain, max_gain]. Blocks below gate_rms or gate_ratio
+    times the tracked noise level let the gain decay towards unity, and peaks
+    above limiter_knee are compressed with tanh instead of clipping.
+    """
+    def __init__(self, rate, target_rms=3000, min_gain=1.0, max_gain=8.0, attack_ms=5, release_ms=800,
+                 gate_rms=120, gate_ratio=2.0, noise_rise_db=1.0, gate_decay_ms=100, limiter_knee=24000):
+        self.block = max(1, int(rate * attack_ms / 1000))
+        self.release = -attack_ms / release_ms  # log decay of the envelope per block
+        self.noise_rise = noise_rise_db / 20 * np.log(10) * attack_ms / 1000  # log rise of the noise level per block
+        self.log_gate_ratio = np.log(gate_ratio)
+        self.gate_decay = np.exp(-attack_ms / gate_decay_ms)  # log gain factor per gated block
+        self.target_rms = target_rms
+        self.min_gain = min_gain
+        self.max_gain = max_gain
+        self.gate_rms = gate_rms
+        self.limiter_knee = limiter_knee
+        self.reset()
+
+    def reset(self):
+        self.log_envelope = -np.inf
+        self.log_noise = np.inf
+        self.gain = 1.0
+
+    def process(self, samples, out=None):
+        """Apply gain and limiter to one chunk of int16 samples; returns int16 (written to out if given)"""
+        start = time.perf_counter()
+        x = np.asarray(samples, dtype=np.float64)
+        count = len(x)
+        n_blocks = max(1, count // self.block)
+        blocks = x[:n_blocks * self.block].reshape(n_blocks, -1) if count >= self.block else x.reshape(1, -1)
+
+        # Envelope: env[k] = max(rms[k], env[k-1] * decay), as a running maximum in the log domain
+        log_rms = 0.5 * np.log(np.mean(blocks ** 2, axis=1) + 1e-9)
+        steps = np.arange(1, n_blocks + 1) * self.release
+        log_envelope = steps + np.maximum.accumulate(np.maximum(log_rms - steps, self.log_envelope))
+        self.log_envelope = log_envelope[-1]
+        # Noise: noise[k] = min(rms[k], noise[k-1] * rise), as a running minimum
+        rises = np.arange(1, n_blocks + 1) * self.noise_rise
+        log_noise = rises + np.minimum.accumulate(np.minimum(log_rms - rises, self.log_noise))
+        self.log_noise = log_noise[-1]
+
+        envelope = np.exp(log_envelope)
+        gains = np.clip(self.target_rms / envelope, self.min_gain, self.max_gain)
+        # Gated (silent) blocks decay from the last active gain towards unity
+        active = (log_rms >= np.log(self.gate_rms)) & (log_rms >= log_noise + self.log_gate_ratio)
+        index = np.arange(n_blocks)
+        held = np.where(active, index, -1)
+        np.maximum.accumulate(held, out=held)
+        log_held = np.where(held >= 0, np.log(gains[np.maximum(held, 0)]), np.log(self.gain))
+        since = np.where(held >= 0, index - held, index + 1)
+        gains = np.exp(log_held * self.gate_decay ** since)
+
+        centres = (np.arange(n_blocks) + 0.5) * (count / n_blocks)
+        per_sample = np.interp(np.arange(count), np.concatenate(([0.0], centres)),
+                               np.concatenate(([self.gain], gains)))
+        self.gain = float(gains[-1])
+
+        y = x * per_sample
+        magnitude = np.abs(y)
+        knee = self.limiter_knee
+        over = magnitude > knee
+        if over.any():
+            headroom = 32767 - knee
+            magnitude[over] = knee + headroom * np.tanh((magnitude[over] - knee) / headroom)
+            y = np.copysign(magnitude, y)
+
+        if out is None:
+            out = np.empty(count, dtype=np.int16)
+        np.copyto(out, np.rint(y), casting='unsafe')
+        metrics.observe('agc.chunk_us', (time.perf_counter() - start) * 1e6)
+        metrics.set_gauge('agc.gain', self.gain)
+        return out
@@ -0,0 +1,250 @@
+from audio.resample import StreamingResampler
+from audio.ringbuffer import AudioRingBuffer
+from contextlib import contextmanager
+from utils import metrics
+from utils.define import CHANNELS, FORMAT, RATE
+
+import asyncio
+import logging
+import numpy as np
+import os
+import pyaudio
+
+logging.basicConfig(level=logging.INFO)
+capture_logger = logging.getLogger(__name__)
+
+def _rate_supported(pyaudio_instance, info, rate, channels):
+    try:
+        return pyaudio_instance.is_format_supported(rate, input_device=info['index'], input_channels=channels,
+                                                    input_format=FORMAT)
+    except ValueError:
+        return False
+
+@contextmanager
+def suppress_stdout_stderr():
+    """A context manager that redirects stdout and stderr to devnull"""
+    try:
+        null = os.open(os.devnull, os.O_RDWR)
+        save_stdout, save_stderr = os.dup(1), os.dup(2)
+        os.dup2(null, 1)
+        os.dup2(null, 2)
+        yield
+    finally:
+        os.dup2(save_stdout, 1)
+        os.dup2(save_stderr, 2)
+        os.close(null)
+
+def open_input_stream(pyaudio_instance, chunk_size, rate=RATE, channels=CHANNELS, device_index=None,
+                      native_rate=False, stream_callback=None):
+    """Open an input stream delivering chunk_size samples at rate; returns (stream, resampler)
+
+    The device is opened at rate whenever PortAudio reports it as supported
+    (ALSA's plug layer resamples outside this process if needed). Only when
+    it is not, when the device is a raw hw: device, or with native_rate, is
+    it opened at its own default sample rate; resampler is then a
+    StreamingResampler to rate for the caller to run on every chunk, else None.
+    """
+    device_rate = rate
+    try:
+        if device_index is None:
+            info = pyaudio_instance.get_default_input_device_info()
+        else:
+            info = pyaudio_instance.get_device_info_by_index(device_index)
+        raw_device = 'hw:' in info.get('name', '')
+        if native_rate or raw_device or not _rate_supported(pyaudio_instance, info, rate, channels):
+            device_rate = int(info['defaultSampleRate'])
+    except Exception as e:
+        capture_logger.warning(f"Could not read the input device rate, opening at {rate} Hz: {e}")
+
+    def open_at(open_rate):
+        return pyaudio_instance.open(
+            format=FORMAT,
+            channels=channels,
+            rate=open_rate,
+            input=True,
+            input_device_index=device_index,
+            frames_per_buffer=round(chunk_size * open_rate / rate),
+            stream_callback=stream_callback
+        )
+
+    if device_rate != rate:
+        try:
+            stream = open_at(device_rate)
+            capture_logger.info(f"Capturing at the native {device_rate} Hz, resampling to {rate} Hz")
+            return stream, StreamingResampler(device_rate, rate)
+        except Exception as e:
+            capture_logger.warning(f"Could not open the input device at {device_rate} Hz, using {rate} Hz: {e}")
+    return open_at(rate), None
+
+class MicrophoneSubscription:
+    """One consumer's view of the MicrophoneBus
+
+    Each subscription keeps its own read position (an absolute sample index)
+    in the bus ring buffer and returns chunk_size samples per read(),
+    independent of other subscribers. A start_index in the past replays audio
+    still held by the ring (pre-roll).
+    """
+    def __init__(self, bus, chunk_size, start_index=None):
+        self.bus = bus
+        self.chunk_size = chunk_size
+        if start_index is None:
+            self.position = bus.ring.total_written
+        else:
+            self.position = min(max(int(start_index), bus.ring.oldest_index), bus.ring.total_written)
+        self.paused = False
+        self.closed = False
+        self._data_event = asyncio.Event()
+
+    def _notify(self):
+        self._data_event.set()
+
+    async def read(self):
+        """Wait for the next chunk_size samples and return them as bytes"""
+        return (await self._next_chunk()).tobytes()
+
+    async def readinto(self, buffer):
+        """Wait for the next chunk_size samples and copy them into buffer (an int16 array of that size)"""
+        np.copyto(buffer, await self._next_chunk())
+
+    async def _next_chunk(self):
+        """Wait for the next chunk_size samples; the returned ring view is only valid until the next write"""
+        while True:
+            if self.closed:
+                raise IOError("Microphone subscription is closed")
+
+            ring = self.bus.ring
+            total = ring.total_written
+            oldest = max(0, total - ring.capacity)
+            if self.position < oldest:
+                # Fell behind by more than the ring holds; skip to the oldest audio still there
+                metrics.increment('capture.subscriber_overruns')
+                self.position = oldest
+
+            if not self.paused and total - self.position >= self.chunk_size:
+                data = ring.read_at(self.position, self.chunk_size)
+                self.position += self.chunk_size
+                return data
+
+            self._data_event.clear()
+            await self._data_event.wait()
+
+    def flush(self):
+        """Drop audio captured but not yet read"""
+        self.position = self.bus.ring.total_written
+
+    def pause(self):
+        """Stop delivering audio, e.g. while our own sounds are playing"""
+        self.paused = True
+
+    def resume(self):
+        """Resume from live audio, skipping whatever was captured while paused"""
+        self.flush()
+        self.paused = False
+        self._notify()
+
+    def is_active(self):
+        return not self.closed and not self.paused and self.bus.is_open()
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.bus.unsubscribe(self)
+            self._notify()
+
+class MicrophoneBus:
+    """Single long-lived microphone stream shared by wake word detection and recording
+
+    PortAudio runs in callback mode; each chunk is handed to the event loop with
+    call_soon_threadsafe and written into one ring buffer. Consumers subscribe
+    with their own chunk size instead of opening and reopening the device.
+    A device that cannot be opened at rate is captured at its native rate and
+    resampled in the callback thread (see open_input_stream).
+    """
+    def __init__(self, chunk_size=256, rate=RATE, channels=CHANNELS, ring_seconds=5, device_index=None,
+                 native_rate=False):
+        self.chunk_size = chunk_size
+        self.rate = rate
+        self.channels = channels
+        self.device_index = device_index
+        self.native_rate = native_rate
+        self.resampler = None
+        self.ring = AudioRingBuffer(ring_seconds * rate)
+        self.subscribers = set()
+        self.pyaudio_instance = None
+        self.stream = None
+        self.loop = None
+
+    def open(self):
+        if self.stream is not None:
+            return self
+        try:
+            self.loop = asyncio.get_running_loop()
+            with suppress_stdout_stderr():
+                if self.pyaudio_instance is None:
+                    self.pyaudio_instance = pyaudio.PyAudio()
+                self.stream, self.resampler = open_input_stream(
+                    self.pyaudio_instance, self.chunk_size, rate=self.rate, channels=self.channels,
+                    device_index=self.device_index, native_rate=self.native_rate,
+                    stream_callback=self._callback
+                )
+            capture_logger.info("Microphone bus opened")
+            return self
+        except Exception as e:
+            capture_logger.error(f"Failed to open microphone bus: {e}")
+            self.close()
+            raise
+
+    def is_open(self):
+        return self.stream is not None
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        if status & pyaudio.paInputOverflow:
+            metrics.increment('capture.input_overflows')
+        if self.resampler is not None:
+            in_data = self.resampler.process(np.frombuffer(in_data, dtype=np.int16)).tobytes()
+        try:
+            self.loop.call_soon_threadsafe(self._dispatch, in_data)
+        except RuntimeError:
+            # Event loop already closed, stop delivering audio
+            return (None, pyaudio.paComplete)
+        return (None, pyaudio.paContinue)
+
+    def _dispatch(self, data):
+        self.ring.write(data)
+        for subscription in self.subscribers:
+            subscription._notify()
+
+    @property
+    def position(self):
+        """Absolute index of the next sample the bus will capture"""
+        return self.ring.total_written
+
+    def subscribe(self, chunk_size, start_index=None):
+        if not self.is_open():
+            self.open()
+        subscription = MicrophoneSubscription(self, chunk_size, start_index)
+        self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self.subscribers.discard(subscription)
+
+    def close(self):
+        for subscription in list(self.subscribers):
+            subscription.close()
+
+        if self.stream is not None:
+            try:
+                if self.stream.is_active():
+                    self.stream.stop_stream()
+                self.stream.close()
+            except Exception as e:
+                capture_logger.error(f"Error closing microphone stream: {e}")
+            self.stream = None
+
+        if self.pyaudio_instance is not None:
+            try:
+                self.pyaudio_instance.terminate()
+            except Exception as e:
+                capture_logger.error(f"Error terminating PyAudio: {e}")
+            self.pyaudio_instance = None
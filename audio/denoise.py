@@ -0,0 +1,71 @@
+from numpy.lib.stride_tricks import sliding_window_view
+from utils import metrics
+
+import numpy as np
+import time
+
+class SpectralSubtractor:
+    """Streaming spectral-subtraction noise suppression for one audio stream
+
+    Overlapping sqrt-Hann frames are attenuated by a noise spectrum averaged
+    (over noise_seconds) from chunks marked is_noise, and added back. Output is
+    delayed by frame_length samples; reset() keeps the noise estimate.
+    """
+    def __init__(self, rate, frame_length=512, over_subtraction=2.0, floor=0.02, noise_seconds=1.0):
+        self.frame_length = frame_length
+        self.hop = frame_length // 2
+        self.over_subtraction = over_subtraction
+        self.floor = floor
+        self.noise_smoothing = np.exp(-self.hop / (rate * noise_seconds))  # noise average weight per frame
+        # Periodic sqrt-Hann: squared windows at 50% overlap sum to one
+        self.window = np.sqrt(0.5 - 0.5 * np.cos(2 * np.pi * np.arange(frame_length) / frame_length))
+        self.noise_power = None
+        self.reset()
+
+    def reset(self):
+        self._history = np.zeros(self.frame_length - self.hop)
+        self._tail = np.zeros(self.hop)
+        self._output = np.zeros(self.hop)
+
+    def process(self, samples, is_noise=False, out=None):
+        """Denoise one chunk of int16 samples; returns int16 (written to out if given)"""
+        start = time.perf_counter()
+        count = len(samples)
+        buffer = np.concatenate((self._history, samples))
+        n_frames = (len(buffer) - self.frame_length) // self.hop + 1
+
+        if n_frames > 0:
+            frames = sliding_window_view(buffer, self.frame_length)[::self.hop][:n_frames] * self.window
+            spectrum = np.fft.rfft(frames, axis=1)
+            power = spectrum.real ** 2 + spectrum.imag ** 2
+
+            if is_noise:
+                frame_noise = power.mean(axis=0)
+                if self.noise_power is None:
+                    self.noise_power = frame_noise
+                else:
+                    weight = self.noise_smoothing ** n_frames
+                    self.noise_power = weight * self.noise_power + (1 - weight) * frame_noise
+
+            if self.noise_power is not None:
+                gain = 1.0 - self.over_subtraction * self.noise_power / np.maximum(power, 1e-10)
+                spectrum *= np.sqrt(np.maximum(gain, self.floor))
+
+            synthesized = np.fft.irfft(spectrum, n=self.frame_length, axis=1) * self.window
+            # Overlap-add: first half of each frame plus the second half of the one before
+            produced = synthesized[:, :self.hop].copy()
+            produced[0] += self._tail
+            produced[1:] += synthesized[:-1, self.hop:]
+            self._tail = synthesized[-1, self.hop:].copy()
+            self._output = np.concatenate((self._output, produced.ravel()))
+            self._history = buffer[n_frames * self.hop:].copy()
+        else:
+            self._history = buffer
+
+        result = np.clip(np.rint(self._output[:count]), -32768, 32767)
+        self._output = self._output[count:]
+        if out is None:
+            out = np.empty(count, dtype=np.int16)
+        np.copyto(out, result, casting='unsafe')
+        metrics.observe('denoise.chunk_us', (time.perf_counter() - start) * 1e6)
+        return out
@@ -0,0 +1,55 @@
+from utils import metrics
+from utils.define import CHANNELS, RATE
+from utils.utils import encode_wav_bytes
+
+import io
+import logging
+import numpy as np
+import time
+
+try:
+    import soundfile
+except ImportError:
+    soundfile = None
+
+logging.basicConfig(level=logging.INFO)
+encoder_logger = logging.getLogger(__name__)
+
+# codec -> (soundfile format, subtype, file name the API sees)
+UPLOAD_CODECS = {
+    "wav": None,
+    "flac": ("FLAC", "PCM_16", "speech.flac"),
+    "opus": ("OGG", "OPUS", "speech.ogg"),
+}
+
+def encode_speech(pcm, codec="flac", rate=RATE, channels=CHANNELS):
+    """Encode 16-bit PCM (bytes, memoryview or int16 array) into an in-memory upload file
+
+    FLAC is lossless and roughly halves speech; Opus is lossy and much smaller.
+    Both need the optional soundfile package (libsndfile); without it, or for
+    an unknown codec, the audio is sent as WAV. The encoded size is published
+    as stt.upload_bytes and the encoding time as stt.encode_ms.
+    """
+    started_at = time.monotonic()
+    spec = UPLOAD_CODECS.get(codec)
+    buffer = None
+    if spec is not None and soundfile is not None:
+        file_format, subtype, name = spec
+        try:
+            samples = np.frombuffer(pcm, dtype=np.int16).reshape(-1, channels)
+            buffer = io.BytesIO()
+            soundfile.write(buffer, samples, rate, format=file_format, subtype=subtype)
+            buffer.seek(0)
+            buffer.name = name
+        except Exception as e:
+            encoder_logger.error(f"{codec} encoding failed, sending WAV: {e}")
+            buffer = None
+    elif spec is not None:
+        encoder_logger.debug("soundfile not installed, sending WAV")
+
+    if buffer is None:
+        buffer = encode_wav_bytes(pcm, rate=rate, channels=channels)
+
+    metrics.observe('stt.encode_ms', (time.monotonic() - started_at) * 1000)
+    metrics.observe('stt.upload_bytes', buffer.getbuffer().nbytes)
+    return buffer
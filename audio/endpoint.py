@@ -0,0 +1,132 @@
+from collections import deque
+
+import logging
+
+logging.basicConfig(level=logging.INFO)
+endpoint_logger = logging.getLogger(__name__)
+
+FINAL_PUNCTUATION = ("。", "？", "！", "?", "!", ".")
+CONTINUATION_PUNCTUATION = ("、", ",", "，", "…")
+
+class FixedEndpointer:
+    """Ends a question after a fixed run of trailing silence
+
+    update() sees the VAD decision of every chunk of the question stream and
+    returns True once speech has started and the silence after it is longer
+    than required_silence_chunks().
+    """
+    name = "fixed"
+
+    def __init__(self, chunks_per_second, silence_seconds=2.0):
+        self.chunks_per_second = chunks_per_second
+        self.silence_seconds = silence_seconds
+        self.reset()
+
+    def reset(self):
+        self.speech_started = False
+        self.speech_chunks = 0
+        self.utterance_chunks = 0  # From the first speech chunk to the last one
+        self.silent_chunks = 0
+
+    def required_silence_chunks(self):
+        return int(self.silence_seconds * self.chunks_per_second)
+
+    def update(self, speaking, energy):
+        """Add one chunk's VAD decision and energy; return True when the question has ended"""
+        if speaking:
+            self.speech_started = True
+            self.speech_chunks += 1
+            self.utterance_chunks += self.silent_chunks + 1
+            self.silent_chunks = 0
+            return False
+        if not self.speech_started:
+            return False
+        self.silent_chunks += 1
+        return self.silent_chunks > self.required_silence_chunks()
+
+    def note_transcript(self, text):
+        """Partial transcript covering everything said so far (ignored here)"""
+        pass
+
+class AdaptiveEndpointer(FixedEndpointer):
+    """Trailing-silence threshold that adapts to how the question was spoken
+
+    It grows with the utterance length from min_silence to max_silence, and
+    shrinks when speech trailed off or the partial transcript ends a sentence.
+    """
+    name = "adaptive"
+
+    def __init__(self, chunks_per_second, min_silence=0.8, max_silence=2.0, short_utterance=1.0,
+                 long_utterance=4.0, tail_chunks=5, decay_ratio=0.5, decay_factor=0.75,
+                 final_factor=0.6, continuation_factor=1.3, floor_silence=0.4):
+        self.min_silence = min_silence
+        self.max_silence = max_silence
+        self.short_utterance = short_utterance
+        self.long_utterance = long_utterance
+        self.decay_ratio = decay_ratio
+        self.decay_factor = decay_factor
+        self.final_factor = final_factor
+        self.continuation_factor = continuation_factor
+        self.floor_silence = floor_silence
+        self.tail = deque(maxlen=tail_chunks)
+        super().__init__(chunks_per_second, silence_seconds=max_silence)
+
+    def reset(self):
+        super().reset()
+        self.tail.clear()
+        self.speech_energy = 0.0
+        self.decayed = False
+        self.transcript_hint = None
+        self._required = None
+
+    def required_silence_chunks(self):
+        if self._required is None:
+            utterance_seconds = self.utterance_chunks / self.chunks_per_second
+            span = (utterance_seconds - self.short_utterance) / (self.long_utterance - self.short_utterance)
+            seconds = self.min_silence + (self.max_silence - self.min_silence) * min(max(span, 0.0), 1.0)
+            if self.decayed:
+                seconds *= self.decay_factor
+            if self.transcript_hint == "final":
+                seconds *= self.final_factor
+            elif self.transcript_hint == "continuation":
+                seconds *= self.continuation_factor
+            seconds = min(max(seconds, self.floor_silence), self.max_silence)
+            self._required = int(seconds * self.chunks_per_second)
+        return self._required
+
+    def update(self, speaking, energy):
+        if speaking:
+            self.speech_energy += energy
+            self.tail.append(energy)
+            # New speech: the last transcript no longer covers everything said
+            self.transcript_hint = None
+            self._required = None
+        elif self.speech_started and self.silent_chunks == 0 and self.tail:
+            mean_energy = self.speech_energy / (self.speech_chunks + 1e-9)
+            self.decayed = sum(self.tail) / len(self.tail) < self.decay_ratio * mean_energy
+            self._required = None
+        return super().update(speaking, energy)
+
+    def note_transcript(self, text):
+        text = (text or "").rstrip()
+        hint = None
+        if text.endswith(FINAL_PUNCTUATION):
+            hint = "final"
+        elif text.endswith(CONTINUATION_PUNCTUATION):
+            hint = "continuation"
+        if hint != self.transcript_hint:
+            self.transcript_hint = hint
+            self._required = None
+
+ENDPOINTERS = {
+    FixedEndpointer.name: FixedEndpointer,
+    AdaptiveEndpointer.name: AdaptiveEndpointer,
+}
+
+def create_endpointer(name, chunks_per_second):
+    """Create an endpointer by name; unknown names fall back to the adaptive one"""
+    endpointer = ENDPOINTERS.get(name)
+    if endpointer is None:
+        endpoint_logger.warning(f"Unknown endpointer '{name}', using adaptive")
+        endpointer = AdaptiveEndpointer
+    return endpointer(chunks_per_second)
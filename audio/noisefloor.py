@@ -0,0 +1,47 @@
+from collections import deque
+
+import math
+
+class NoiseFloorTracker:
+    """Minimum-statistics noise floor estimate, updated per chunk in constant memory
+
+    The floor is bias times the lowest smoothed chunk energy over the last
+    num_subwindows sub-windows, so speech shorter than that never lifts it.
+    """
+    def __init__(self, subwindow_seconds=1.0, num_subwindows=5, smoothing=0.8, bias=1.5):
+        self.subwindow_seconds = subwindow_seconds
+        self.smoothing = smoothing
+        self.bias = bias
+        self.minima = deque(maxlen=num_subwindows)
+        self.reset()
+
+    def reset(self):
+        self.minima.clear()
+        self.smoothed = None
+        self.current_min = math.inf
+        self.elapsed = 0.0
+        self.floor = None
+
+    def seed(self, floor):
+        """Restart from a floor measured elsewhere; it ages out like any sub-window minimum"""
+        self.reset()
+        self.minima.append(floor / self.bias)
+        self.floor = floor
+
+    def update(self, energy, duration):
+        """Add one chunk's mean energy (duration in seconds), return the floor or None while warming up"""
+        if self.smoothed is None:
+            self.smoothed = energy
+        else:
+            self.smoothed = self.smoothing * self.smoothed + (1 - self.smoothing) * energy
+        self.current_min = min(self.current_min, self.smoothed)
+
+        self.elapsed += duration
+        if self.elapsed >= self.subwindow_seconds:
+            self.minima.append(self.current_min)
+            self.current_min = math.inf
+            self.elapsed = 0.0
+
+        if self.minima:
+            self.floor = self.bias * min(min(self.minima), self.current_min)
+        return self.floor
@@ -1,70 +1,87 @@
-from utils.define import CHANNELS, RATE
-from contextlib import contextmanager
+from audio.agc import AutomaticGainControl
+from audio.denoise import SpectralSubtractor
+from audio.endpoint import create_endpointer
+from audio.noisefloor import NoiseFloorTracker
+from audio.vad import create_vad
+from utils import metrics
+from utils.define import CHANNELS, RATE, TRIM_LEAD_SECONDS, TRIM_TRAIL_SECONDS, WAKE_PREROLL_SECONDS
 from scipy.signal import butter, lfilter
 
 import asyncio
-import pyaudio
 import os
 import numpy as np
 import logging
 import tempfile
+import time
 import wave
 
 logging.basicConfig(level=logging.INFO)
 recorder_logger = logging.getLogger(__name__)
 
-@contextmanager
-def suppress_stdout_stderr():
-    """A context manager that redirects stdout and stderr to devnull"""
-    try:
-        null = os.open(os.devnull, os.O_RDWR)
-        save_stdout, save_stderr = os.dup(1), os.dup(2)
-        os.dup2(null, 1)
-        os.dup2(null, 2)
-        yield
-    finally:
-        os.dup2(save_stdout, 1)
-        os.dup2(save_stderr, 2)
-        os.close(null)
-
 class PyRecorder:
-    def __init__(self):
+    def __init__(self, microphone, vad='energy', endpointing='adaptive',
+                 trim_lead=TRIM_LEAD_SECONDS, trim_trail=TRIM_TRAIL_SECONDS, noise_suppression=False,
+                 agc=False, preroll=WAKE_PREROLL_SECONDS):
+        self.microphone = microphone
         self.stream = None
         self.beep_file = self.generate_beep_file()
         self.CHUNK_DURATION_MS = 30 
         self.CHUNK_SIZE = int(RATE * self.CHUNK_DURATION_MS / 1000)
         self.CHUNKS_PER_SECOND = 1000 // self.CHUNK_DURATION_MS
+        self.PREROLL_SAMPLES = int(preroll * RATE)
+        if microphone is not None:
+            # Older audio is no longer in the bus ring
+            self.PREROLL_SAMPLES = min(self.PREROLL_SAMPLES, microphone.ring.capacity)
+        self.MAX_QUESTION_CHUNKS = 30 * self.CHUNKS_PER_SECOND
+        # Questions are captured in place; chunks, segments and the result are views of it
+        self.question_buffer = np.zeros(self.MAX_QUESTION_CHUNKS * self.CHUNK_SIZE, dtype=np.int16)
+        # Silence around the speech is cut before upload, keeping these margins
+        self.TRIM_LEAD_CHUNKS = int(trim_lead * self.CHUNKS_PER_SECOND)
+        self.TRIM_TRAIL_CHUNKS = int(trim_trail * self.CHUNKS_PER_SECOND)
         
         self.energy_threshold = None
         self.silence_energy = None
+        # Kept current from every captured chunk, no separate calibration pass
+        self.noise_floor = NoiseFloorTracker()
+        # VAD for the question stream; other streams create their own from vad_name
+        self.vad_name = vad
+        self.vad = create_vad(vad, self)
+        # Decides when the question has ended from the per-chunk VAD decisions
+        self.endpointer = create_endpointer(endpointing, self.CHUNKS_PER_SECOND)
+        # Optional spectral subtraction of the question audio; the VAD still sees the raw chunks
+        self.denoiser = SpectralSubtractor(rate=RATE) if noise_suppression else None
+        # Optional gain control for the upload; the VAD and noise floor stay on the raw chunks
+        self.agc = AutomaticGainControl(rate=RATE) if agc else None
 
         self.energy_window_size = 50  
         self.recent_energy_levels = []
 
-        with suppress_stdout_stderr():
-            self.pyaudio = pyaudio.PyAudio()
-
         self.device_error_count = 0
         self.max_device_errors = 3
 
+        # Streaming transcription: questions are cut into segments at short pauses
+        self.SEGMENT_PAUSE_CHUNKS = int(0.4 * self.CHUNKS_PER_SECOND)
+        self.MIN_SEGMENT_CHUNKS = int(1.0 * self.CHUNKS_PER_SECOND)
+        self.MAX_SEGMENT_CHUNKS = int(8.0 * self.CHUNKS_PER_SECOND)
+
         self.SNR_THRESHOLD = 10  # Signal-to-Noise Ratio threshold
         self.NOISE_FLOOR = 100   # Minimum noise level to consider
         self.ENERGY_SCALE = 1.0 # Scale factor for energy values
 
-    def start_stream(self):
-        if self.stream is None or not self.stream.is_active():
-            with suppress_stdout_stderr():
-                self.stream = self.pyaudio.open(format=pyaudio.paInt16,
-                                          channels=CHANNELS,
-                                          rate=RATE,
-                                          input=True,
-                                          frames_per_buffer=self.CHUNK_SIZE)
+    def start_stream(self, start_index=None):
+        """Subscribe to the shared microphone bus; the device itself stays open
+
+        start_index replays audio captured since that bus index, up to the
+        pre-roll (WAKE_PREROLL_SECONDS by default) back.
+        """
+        if start_index is not None:
+            start_index = max(start_index, self.microphone.position - self.PREROLL_SAMPLES)
+        if self.stream is None or self.stream.closed:
+            self.stream = self.microphone.subscribe(self.CHUNK_SIZE, start_index)
 
     def stop_stream(self):
         if self.stream:
             try:
-                if self.stream.is_active():
-                    self.stream.stop_stream()
                 self.stream.close()
             except Exception as e:
                 recorder_logger.error(f"Error stopping stream: {e}")
@@ -79,20 +96,6 @@ class PyRecorder:
         wf.writeframes(frames)
         wf.close()
 
-    def butter_bandpass(self, lowcut=300, highcut=3000, fs=16000, order=5):
-        """Create a bandpass filter to focus on speech frequencies"""
-        nyq = 0.5 * fs
-        low = lowcut / nyq
-        high = highcut / nyq
-        b, a = butter(order, [low, high], btype='band')
-        return b, a
-
-    def apply_bandpass_filter(self, data):
-        """Apply bandpass filter to focus on speech frequencies"""
-        b, a = self.butter_bandpass()
-        filtered_data = lfilter(b, a, data)
-        return filtered_data
-    
     def butter_lowpass(self, cutoff, fs, order=5):
         nyq = 0.5 * fs
         normal_cutoff = cutoff / nyq
@@ -104,20 +107,17 @@ class PyRecorder:
         y = lfilter(b, a, data)
         return y
 
-    def calibrate_energy_threshold(self, audio_frames):
+    def update_noise_floor(self, audio_frame, energy=None):
+        """Feed one captured chunk to the noise floor tracker and refresh energy_threshold"""
         try:
-            energy_levels = []
-            for frame in audio_frames:
-                audio_chunk = np.frombuffer(frame, dtype=np.int16)
-                # Apply bandpass filter
-                filtered_audio = self.apply_bandpass_filter(audio_chunk)
-                energy = np.sum(filtered_audio**2) / len(filtered_audio)
-                energy_levels.append(energy)
-            
-            # Calculate more robust silence threshold
-            energy_levels = np.array(energy_levels)
-            self.silence_energy = np.median(energy_levels)  # Use median instead of mean
-            
+            if energy is None:
+                _, energy = self.vad.process(audio_frame)
+            samples = audio_frame.size if isinstance(audio_frame, np.ndarray) else len(audio_frame) // 2
+            floor = self.noise_floor.update(energy, samples / RATE)
+            if floor is None:
+                return
+
+            self.silence_energy = floor
             # Dynamically adjust multiplier based on noise level
             if self.silence_energy < 1000:
                 multiplier = 2.0  # Lower threshold for quiet environments
@@ -125,16 +125,10 @@ class PyRecorder:
                 multiplier = 2.5
             else:
                 multiplier = 3.0  # Higher threshold for noisy environments
-            
             self.energy_threshold = self.silence_energy * multiplier
-            recorder_logger.info(f"Calibration complete. Silence energy: {self.silence_energy}, "
-                               f"Threshold: {self.energy_threshold}, Multiplier: {multiplier}")
             
         except Exception as e:
-            recorder_logger.error(f"Error in calibration: {e}")
-            # Set default values if calibration fails
-            self.silence_energy = 1000
-            self.energy_threshold = 3000
+            recorder_logger.error(f"Error updating noise floor: {e}")
     
     # def calibrate_energy_threshold(self, audio_frames):
     #     energy_levels = []
@@ -169,6 +163,12 @@ class PyRecorder:
     #     recorder_logger.info(f"Calibration complete. Silence energy: {self.silence_energy}, Threshold: {self.energy_threshold}")
     
     def is_speech(self, audio_frame):
+        """VAD decision for the next chunk of the question stream"""
+        speaking, _ = self.vad.process(audio_frame)
+        return speaking
+
+    def energy_is_speech(self, signal_energy):
+        """Energy backend rule: speech-band energy above the threshold with enough SNR"""
         if self.energy_threshold is None:
             return False
         # audio_chunk = np.frombuffer(audio_frame, dtype=np.int16)
@@ -176,13 +176,6 @@ class PyRecorder:
         # energy = np.sum(filtered_audio**2) / len(filtered_audio)
         # return energy > self.energy_threshold
         try:
-            audio_chunk = np.frombuffer(audio_frame, dtype=np.int16)
-            
-            # Apply bandpass filter for speech frequencies
-            filtered_audio = self.apply_bandpass_filter(audio_chunk)
-            
-            # Calculate signal energy
-            signal_energy = np.sum(filtered_audio**2) / len(filtered_audio)
             
             # Calculate SNR
             noise_floor = max(self.silence_energy, self.NOISE_FLOOR)
@@ -196,53 +189,129 @@ class PyRecorder:
             recorder_logger.error(f"Error in speech detection: {e}")
             return False
 
-    async def record_question(self, audio_player):
+    def enhance(self, data, speech_started, energy):
+        """Apply the optional denoiser and AGC to one chunk in place, after the VAD has seen it"""
+        if self.denoiser:
+            # Noise is only learnt before the question starts, from chunks below the speech threshold
+            is_noise = (not speech_started and self.energy_threshold is not None
+                        and energy < self.energy_threshold)
+            self.denoiser.process(data, is_noise=is_noise, out=data)
+        if self.agc:
+            self.agc.process(data, out=data)
+
+    def _question_pcm(self, start_chunk, end_chunk):
+        """Bytes view of chunks [start_chunk, end_chunk) of question_buffer, no copy"""
+        return memoryview(self.question_buffer[start_chunk * self.CHUNK_SIZE:end_chunk * self.CHUNK_SIZE]).cast('B')
+
+    async def record_question(self, audio_player, start_index=None, pressed_at=None, on_segment=None,
+                              partial_transcript=None):
+        """Record one spoken question and return its PCM, or None if nothing was said
+
+        The PCM is a memoryview of question_buffer, valid until the next
+        record_question call; chunks are read into the buffer in place. It
+        is trimmed to the chunks the VAD flagged as speech plus
+        TRIM_LEAD_CHUNKS before and TRIM_TRAIL_CHUNKS after.
+
+        With on_segment, speech is also handed over in segments (bytes copies,
+        since transcription threads may outlive this call) while it is
+        captured: a segment ends in the middle of a pause of
+        SEGMENT_PAUSE_CHUNKS (once it is MIN_SEGMENT_CHUNKS long) or after
+        MAX_SEGMENT_CHUNKS, and the remainder is handed over at the endpoint
+        if it holds any speech.
+
+        partial_transcript, if given, returns the transcript of the handed-over
+        segments once all of them are done (else None); while everything said
+        so far has been handed over it is passed on to the endpointer.
+        """
         tasks = set()
         try:
             max_retries = 3
             for attempt in range(max_retries):
                 try:
-                    self.start_stream()
+                    self.start_stream(start_index)
                     break
                 except Exception as e:
                     recorder_logger.error(f"Stream start attempt {attempt + 1} failed: {e}")
                     if attempt == max_retries - 1:
                         return None
                     await asyncio.sleep(1)
+            if pressed_at is not None:
+                # Push-to-talk: time from the button poll before the press to recording running
+                metrics.observe('ptt.latency_ms', (time.monotonic() - pressed_at) * 1000)
             recorder_logger.info("Listening... Speak your question.")
+            calibration = getattr(self.microphone, 'calibration', None)
+            if calibration is not None:
+                # Capture runs in another process that tracked the room; we only hear questions
+                self.silence_energy, self.energy_threshold = calibration
+                self.noise_floor.seed(self.silence_energy)
+            self.vad.reset()
+            self.endpointer.reset()
+            if self.denoiser:
+                self.denoiser.reset()
+            if self.agc:
+                self.agc.reset()
 
-            frames = []
             silent_chunks = 0
             is_speaking = False
             total_chunks = 0
-            silence_duration = 2
-            max_duration = 30
-            max_silent_chunks = int(silence_duration * self.CHUNKS_PER_SECOND)
+            first_speech = last_speech = None
+            segment_start = 0
+            segment_has_speech = False
+            segments_submitted = 0
 
             while True:
                 try:
-                    data = self.stream.read(self.CHUNK_SIZE, exception_on_overflow=False)
-                    frames.append(data)
+                    data = self.question_buffer[total_chunks * self.CHUNK_SIZE:(total_chunks + 1) * self.CHUNK_SIZE]
+                    await self.stream.readinto(data)
                     total_chunks += 1
 
-                    if self.is_speech(data):
+                    speaking, energy = self.vad.process(data)
+                    self.update_noise_floor(data, energy)
+                    ended = self.endpointer.update(speaking, energy)
+                    self.enhance(data, speaking or is_speaking, energy)
+                    if speaking:
                         if not is_speaking:
                             recorder_logger.info("Speech detected. Recording...")
                             is_speaking = True
+                            first_speech = total_chunks - 1
+                            segment_start = max(0, first_speech - self.TRIM_LEAD_CHUNKS)
+                        last_speech = total_chunks - 1
                         silent_chunks = 0
                     else:
                         silent_chunks += 1
 
+                    if on_segment and is_speaking:
+                        segment_has_speech = segment_has_speech or speaking
+                        segment_chunks = total_chunks - segment_start
+                        cut = None
+                        if silent_chunks == self.SEGMENT_PAUSE_CHUNKS and segment_chunks >= self.MIN_SEGMENT_CHUNKS:
+                            cut = total_chunks - silent_chunks // 2
+                        elif segment_chunks >= self.MAX_SEGMENT_CHUNKS:
+                            cut = total_chunks
+                        if cut is not None:
+                            on_segment(bytes(self._question_pcm(segment_start, cut)))
+                            segments_submitted += 1
+                            segment_start = cut
+                            segment_has_speech = False
+
+                    if partial_transcript and segments_submitted and not segment_has_speech and not speaking:
+                        text = partial_transcript()
+                        if text is not None:
+                            self.endpointer.note_transcript(text)
+
                     if is_speaking:
-                        if silent_chunks > max_silent_chunks:
-                            recorder_logger.info(f"End of speech detected. Total chunks: {total_chunks}")
+                        if ended:
+                            silence_ms = silent_chunks * self.CHUNK_DURATION_MS
+                            metrics.observe('endpoint.silence_ms', silence_ms)
+                            recorder_logger.info(f"End of speech detected after {silence_ms} ms of silence. "
+                                                 f"Total chunks: {total_chunks}")
                             break
                     elif total_chunks > 5 * self.CHUNKS_PER_SECOND:  
                         recorder_logger.info("No speech detected. Stopping recording.")
                         self.stop_stream()
                         return None
 
-                    if total_chunks > max_duration * self.CHUNKS_PER_SECOND:
+                    if total_chunks >= self.MAX_QUESTION_CHUNKS:
                         recorder_logger.info(f"Maximum duration reached. Total chunks: {total_chunks}")
                         break
 
@@ -258,21 +327,31 @@ class PyRecorder:
                     recorder_logger.error(f"Unexpected error during recording: {e}")
                     return None
 
-            if frames:
+            if total_chunks:
+                start, end = 0, total_chunks
+                if first_speech is not None:
+                    start = max(0, first_speech - self.TRIM_LEAD_CHUNKS)
+                    end = min(total_chunks, last_speech + 1 + self.TRIM_TRAIL_CHUNKS)
+                recorder_logger.info(f"Question trimmed from {total_chunks * self.CHUNK_DURATION_MS / 1000:.2f} s "
+                                     f"to {(end - start) * self.CHUNK_DURATION_MS / 1000:.2f} s")
+                metrics.observe('recorder.trimmed_ms', (total_chunks - (end - start)) * self.CHUNK_DURATION_MS)
+                frames = self._question_pcm(start, end)
+                if on_segment and segment_has_speech:
+                    on_segment(bytes(self._question_pcm(segment_start, end)))
                 try:
-                    recorder_logger.info("Stopping recording stream for beep playback")
+                    recorder_logger.info("Pausing recording stream for beep playback")
                     if not await self._play_beep_with_retry(audio_player):
                         recorder_logger.error("Failed to play beep after retries")
-                    return b''.join(frames)
+                    return frames
 
                 except Exception as e:
                     recorder_logger.error(f"Error playing beep sound: {e}")
-                    return b''.join(frames)
+                    return frames
                 finally:
                     try:
                         await asyncio.sleep(0.2)
                         if self.stream:
-                            self.stream.start_stream()
+                            self.stream.resume()
                     except Exception as e:
                         recorder_logger.error(f"Error restarting stream: {e}")
 
@@ -301,7 +380,7 @@ class PyRecorder:
         try:
             recorder_logger.info("Playing beep sound...")
             if self.stream and self.stream.is_active():
-                self.stream.stop_stream()
+                self.stream.pause()
             
             await audio_player.play_audio(self.beep_file)
             return True
@@ -334,13 +413,5 @@ class PyRecorder:
             self.stop_stream()
             if hasattr(self, 'beep_file') and os.path.exists(self.beep_file):
                 os.remove(self.beep_file)
-            if self.pyaudio and (self.pyaudio._ptr is not None):  
-                try:
-                    active_streams = sum(1 for i in range(self.pyaudio.get_host_api_count()) 
-                                    for j in range(self.pyaudio.get_device_count()))
-                    if active_streams <= 1:  
-                        self.pyaudio.terminate()
-                except:
-                    pass  
         except:
             pass
\ No newline at end of file
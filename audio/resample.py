@@ -0,0 +1,49 @@
+from math import gcd
+from scipy.signal import firwin
+from utils import metrics
+from utils.define import RATE
+
+import numpy as np
+import time
+
+class StreamingResampler:
+    """Polyphase FIR resampler from in_rate to out_rate for one audio stream
+
+    Filter history and output phase carry over between chunks, so chunk
+    boundaries are seamless.
+    """
+    def __init__(self, in_rate, out_rate=RATE, taps_per_phase=64, rolloff=0.9):
+        divisor = gcd(int(in_rate), int(out_rate))
+        self.in_rate = int(in_rate)
+        self.out_rate = int(out_rate)
+        self.up = self.out_rate // divisor
+        self.down = self.in_rate // divisor
+        self.taps = taps_per_phase
+
+        prototype = firwin(self.up * self.taps, rolloff / max(self.up, self.down), window=('kaiser', 8.0))
+        # phases[p, k] weights input sample base - k for outputs in phase p
+        self.phases = (prototype * self.up).reshape(self.taps, self.up).T.copy()
+        self.offsets = np.arange(self.taps)
+        self.reset()
+
+    def reset(self):
+        self._history = np.zeros(self.taps - 1)
+        # Position of the next output on the upsampled grid, relative to the start of the history
+        self._position = (self.taps - 1) * self.up
+
+    def process(self, samples):
+        """Resample one chunk of int16 samples; returns int16 (about len * out_rate / in_rate samples)"""
+        start = time.perf_counter()
+        buffer = np.concatenate((self._history, samples))
+        last = (len(buffer) - 1) * self.up
+        count = (last - self._position) // self.down + 1 if last >= self._position else 0
+
+        positions = self._position + self.down * np.arange(count)
+        bases = positions // self.up
+        output = np.einsum('ij,ij->i', self.phases[positions % self.up], buffer[bases[:, None] - self.offsets])
+
+        self._position += self.down * count - (len(buffer) - (self.taps - 1)) * self.up
+        self._history = buffer[len(buffer) - (self.taps - 1):]
+        result = np.clip(np.rint(output), -32768, 32767).astype(np.int16)
+        metrics.observe('capture.resample_us', (time.perf_counter() - start) * 1e6)
+        return result
@@ -0,0 +1,114 @@
+import numpy as np
+
+class AudioRingBuffer:
+    """Fixed-size int16 ring buffer that hands out recent audio as views
+
+    Every sample is stored twice (at i and i + capacity), so any run of the
+    newest samples is one contiguous slice and reading never copies.
+    """
+    def __init__(self, capacity):
+        self.capacity = int(capacity)
+        self._buffer = np.zeros(self.capacity * 2, dtype=np.int16)
+        self.total_written = 0
+
+    def write(self, data):
+        samples = np.frombuffer(data, dtype=np.int16)
+        written = len(samples)
+        if len(samples) > self.capacity:
+            samples = samples[-self.capacity:]
+
+        count = len(samples)
+        # Samples dropped from an oversized write still advance the position
+        pos = (self.total_written + written - count) % self.capacity
+        first = min(count, self.capacity - pos)
+        rest = count - first
+
+        self._buffer[pos:pos + first] = samples[:first]
+        self._buffer[pos + self.capacity:pos + self.capacity + first] = samples[:first]
+        if rest:
+            self._buffer[:rest] = samples[first:]
+            self._buffer[self.capacity:self.capacity + rest] = samples[first:]
+
+        # Published last, so a reader in another process never sees samples before they land
+        self.total_written += written
+
+    def latest(self, count):
+        """Return a view of the newest count samples"""
+        # One read of the counter: in shared memory it can move between two reads
+        total = self.total_written
+        count = min(int(count), self.capacity, total)
+        end = total % self.capacity + self.capacity
+        return self._buffer[end - count:end]
+
+    @property
+    def oldest_index(self):
+        """Absolute index of the oldest sample still held"""
+        return max(0, self.total_written - self.capacity)
+
+    def read_at(self, start, count):
+        """Return a view of count samples starting at absolute sample index start"""
+        total = self.total_written
+        start = max(int(start), total - self.capacity, 0)
+        count = max(0, min(int(count), total - start))
+        begin = total % self.capacity + self.capacity - (total - start)
+        return self._buffer[begin:begin + count]
+
+    def clear(self):
+        self.total_written = 0
+
+class SharedAudioRingBuffer(AudioRingBuffer):
+    """AudioRingBuffer laid out in a shared buffer (e.g. multiprocessing.shared_memory)
+
+    Layout: an int64 sample counter followed by the mirrored int16 samples.
+    One process writes, others read; readers only trust samples below the
+    published total_written.
+    """
+    HEADER_BYTES = 8
+
+    @classmethod
+    def size_for(cls, capacity):
+        return cls.HEADER_BYTES + int(capacity) * 2 * np.dtype(np.int16).itemsize
+
+    def __init__(self, capacity, buffer, create=False):
+        self.capacity = int(capacity)
+        self._header = np.ndarray((1,), dtype=np.int64, buffer=buffer)
+        self._buffer = np.ndarray((self.capacity * 2,), dtype=np.int16, buffer=buffer, offset=self.HEADER_BYTES)
+        if create:
+            self.clear()
+
+    @property
+    def total_written(self):
+        return int(self._header[0])
+
+    @total_written.setter
+    def total_written(self, value):
+        self._header[0] = value
+
+    def release(self):
+        """Drop the views so the shared memory can be closed"""
+        self._header = None
+        self._buffer = None
+
+class SlidingWindow:
+    """Overlapping analysis windows (window_length samples, advanced by hop_length) over a ring buffer"""
+    def __init__(self, window_length, hop_length):
+        self.window_length = int(window_length)
+        self.hop_length = int(hop_length)
+        self.ring = AudioRingBuffer(self.window_length)
+        self._since_hop = 0
+
+    def push(self, data):
+        """Add captured audio, return True when a new window is due"""
+        self.ring.write(data)
+        self._since_hop += len(data) // 2
+        if self._since_hop >= self.hop_length and self.ring.total_written >= self.window_length:
+            self._since_hop %= self.hop_length
+            return True
+        return False
+
+    def window(self):
+        return self.ring.latest(self.window_length)
+
+    def reset(self):
+        self.ring.clear()
+        self._since_hop = 0
@@ -0,0 +1,163 @@
+from scipy.signal import butter, sosfilt
+from utils import metrics
+from utils.define import RATE
+
+import logging
+import numpy as np
+import time
+
+logging.basicConfig(level=logging.INFO)
+vad_logger = logging.getLogger(__name__)
+
+class StreamingSpeechDetector:
+    """Speech-band energy of consecutive chunks from one audio stream
+
+    The bandpass state is carried from chunk to chunk, so chunks are filtered
+    as one continuous signal. Call reset() when the stream is discontinuous.
+    """
+    def __init__(self, rate=RATE, lowcut=300, highcut=3000, order=5, max_chunk=4096):
+        nyq = 0.5 * rate
+        self.sos = butter(order, [lowcut / nyq, highcut / nyq], btype='band', output='sos')
+        self.zi = np.zeros((self.sos.shape[0], 2))
+        self._buffer = np.zeros(max_chunk)
+
+    def reset(self):
+        self.zi.fill(0.0)
+
+    def energy(self, audio_chunk):
+        """Mean speech-band energy of the chunk (bytes or int16 samples)"""
+        if isinstance(audio_chunk, (bytes, bytearray, memoryview)):
+            audio_chunk = np.frombuffer(audio_chunk, dtype=np.int16)
+        count = len(audio_chunk)
+        if count == 0:
+            return 0.0
+        if count > len(self._buffer):
+            self._buffer = np.zeros(count)
+
+        samples = self._buffer[:count]
+        np.copyto(samples, audio_chunk)
+        filtered, self.zi = sosfilt(self.sos, samples, zi=self.zi)
+        return float(np.dot(filtered, filtered) / count)
+
+class VadBackend:
+    """Voice activity decision for consecutive chunks of one stream
+
+    process() returns (is_speech, energy); energy is the speech-band energy on
+    the scale PyRecorder's noise floor and thresholds use. The CPU cost of
+    every call is published as vad.<name>.chunk_us. Thresholds come from the
+    owning PyRecorder; until it has an energy_threshold no chunk is speech.
+    Backends override analyse(); the default applies PyRecorder's energy
+    rule to the unfiltered chunk energy.
+    """
+    name = "base"
+
+    def __init__(self, py_recorder, rate=RATE):
+        self.py_recorder = py_recorder
+        self.rate = rate
+
+    def process(self, audio_chunk):
+        if isinstance(audio_chunk, (bytes, bytearray, memoryview)):
+            audio_chunk = np.frombuffer(audio_chunk, dtype=np.int16)
+        start = time.perf_counter()
+        result = self.analyse(audio_chunk)
+        metrics.observe(f'vad.{self.name}.chunk_us', (time.perf_counter() - start) * 1e6)
+        return result
+
+    def analyse(self, samples):
+        count = len(samples)
+        if count == 0:
+            return False, 0.0
+        x = samples.astype(np.float64)
+        energy = float(np.dot(x, x) / count)
+        return self.py_recorder.energy_is_speech(energy), energy
+
+    def reset(self):
+        pass
+
+class EnergyVad(VadBackend):
+    """Band energy plus SNR against the noise floor (PyRecorder.energy_is_speech)"""
+    name = "energy"
+
+    def __init__(self, py_recorder, rate=RATE):
+        super().__init__(py_recorder, rate)
+        self.detector = StreamingSpeechDetector(rate=rate)
+
+    def analyse(self, samples):
+        energy = self.detector.energy(samples)
+        return self.py_recorder.energy_is_speech(energy), energy
+
+    def reset(self):
+        self.detector.reset()
+
+class SpectralVad(VadBackend):
+    """Spectral-shape VAD: flatness, zero-crossing rate and speech-band ratio
+
+    One windowed rfft per chunk. Broadband noise (fans) has a flat spectrum and
+    is rejected even when loud, so the energy requirement can be lower than
+    the energy backend's and soft speakers still pass.
+    """
+    name = "spectral"
+
+    def __init__(self, py_recorder, rate=RATE, lowcut=300, highcut=3000,
+                 max_flatness=0.4, min_band_ratio=0.25, zcr_range=(0.01, 0.3), min_snr_factor=1.5):
+        super().__init__(py_recorder, rate)
+        self.lowcut = lowcut
+        self.highcut = highcut
+        self.max_flatness = max_flatness
+        self.min_band_ratio = min_band_ratio
+        self.zcr_range = zcr_range
+        self.min_snr_factor = min_snr_factor
+        self._plans = {}
+
+    def _plan(self, count):
+        """Window, band mask, scale and buffer depend only on the chunk length, so they are cached"""
+        plan = self._plans.get(count)
+        if plan is None:
+            window = np.hanning(count)
+            freqs = np.fft.rfftfreq(count, 1 / self.rate)
+            band = (freqs >= self.lowcut) & (freqs <= self.highcut)
+            # Parseval with the window's power: band power -> mean energy per sample
+            scale = 2 / (count * np.sum(window ** 2))
+            plan = self._plans[count] = (window, band, scale, np.zeros(count))
+        return plan
+
+    def analyse(self, samples):
+        count = len(samples)
+        if count < 2:
+            return False, 0.0
+        window, band, scale, buffer = self._plan(count)
+
+        np.multiply(samples, window, out=buffer)
+        spectrum = np.fft.rfft(buffer)
+        power = spectrum.real ** 2 + spectrum.imag ** 2
+        band_power = power[band]
+        band_total = band_power.sum()
+        energy = float(band_total * scale)
+
+        recorder = self.py_recorder
+        if recorder.energy_threshold is None:
+            return False, energy
+        if energy <= max(recorder.silence_energy * self.min_snr_factor, recorder.NOISE_FLOOR):
+            return False, energy
+
+        eps = 1e-10
+        flatness = np.exp(np.mean(np.log(band_power + eps))) / (np.mean(band_power) + eps)
+        band_ratio = band_total / (power.sum() + eps)
+        zcr = np.count_nonzero(np.diff(np.signbit(samples))) / count
+
+        speech = (flatness < self.max_flatness and band_ratio > self.min_band_ratio and
+                  self.zcr_range[0] <= zcr <= self.zcr_range[1])
+        return bool(speech), energy
+
+VAD_BACKENDS = {
+    EnergyVad.name: EnergyVad,
+    SpectralVad.name: SpectralVad,
+}
+
+def create_vad(name, py_recorder, rate=RATE):
+    """Create a VAD backend by name; unknown names fall back to the energy backend"""
+    backend = VAD_BACKENDS.get(name)
+    if backend is None:
+        vad_logger.warning(f"Unknown VAD backend '{name}', using energy")
+        backend = EnergyVad
+    return backend(py_recorder, rate=rate)
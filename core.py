@@ -1,9 +1,13 @@
+from audio.capture import MicrophoneBus
 from audio.player import AudioPlayer
 from audio.recorder import PyRecorder
 from utils.define import *
+from utils.metrics import log_metrics
+from utils.scheduler import every
 from display.display import DisplayModule
 from display.manageDisplay import ManageDisplay
 from utils.utils import is_exit_event_set
+from wakeword.process import ProcessMicrophoneBus
 from wakeword.wakeword import WakeWord
 
 import asyncio
@@ -39,15 +43,40 @@ class SpeakerCore:
     def __init__(self, args):
         self.args = args
         self.ai_client = args.aiclient
-        self.py_recorder = PyRecorder()
         self.tasks = set()
+
+        # One long-lived microphone stream shared by wake word detection and recording,
+        # optionally captured in its own process together with the wake word front end
+        if getattr(args, 'wake_process', False):
+            self.microphone = ProcessMicrophoneBus(engine_name=getattr(args, 'wake_engine', 'porcupine'),
+                                                   vad=getattr(args, 'vad', 'energy'),
+                                                   device_index=getattr(args, 'input_device', None),
+                                                   native_rate=getattr(args, 'native_rate', False))
+        else:
+            self.microphone = MicrophoneBus(device_index=getattr(args, 'input_device', None),
+                                            native_rate=getattr(args, 'native_rate', False))
+        try:
+            self.microphone.open()
+        except Exception as e:
+            core_logger.error(f"Microphone unavailable at startup: {e}")
+        self.py_recorder = PyRecorder(microphone=self.microphone, vad=getattr(args, 'vad', 'energy'),
+                                      endpointing=getattr(args, 'endpointing', 'adaptive'),
+                                      trim_lead=getattr(args, 'trim_lead', TRIM_LEAD_SECONDS),
+                                      trim_trail=getattr(args, 'trim_trail', TRIM_TRAIL_SECONDS),
+                                      noise_suppression=getattr(args, 'noise_suppression', False),
+                                      agc=getattr(args, 'agc', False),
+                                      preroll=getattr(args, 'wake_preroll', WAKE_PREROLL_SECONDS))
+        self.streaming_stt = getattr(args, 'streaming_stt', False)
         
         # Initialize components
         self.display_manager = ManageDisplay(server_manger=args.server)
         self.display = DisplayModule(display_manager=self.display_manager)
         self.ai_client.set_display(display=self.display)
+        self.ai_client.set_upload_codec(getattr(args, 'stt_codec', 'flac'))
         self.audio_player = AudioPlayer(self.display)
-        self.wake_word = WakeWord(args=args, audio_player=self.audio_player, display_manager=self.display_manager)
+        self.wake_word = WakeWord(args=args, audio_player=self.audio_player,
+                                  display_manager=self.display_manager, microphone=self.microphone)
+        every(METRICS_LOG_INTERVAL).seconds.do(log_metrics)
         
         core_logger.info("Speaker Core initialized successfully")
 
@@ -85,9 +114,22 @@ class SpeakerCore:
                     
                     if res:
                         if trigger_type == WakeWordType.TRIGGER:
-                            await self.process_conversation()
+                            await self.process_conversation(
+                                start_index=self.wake_word.question_start_index
+                            )
+                        elif trigger_type == WakeWordType.PUSH_TO_TALK:
+                            await self.process_conversation(
+                                start_index=self.wake_word.question_start_index,
+                                pressed_at=self.wake_word.ptt_pressed_at
+                            )
                         elif trigger_type == WakeWordType.SCHEDULE:
                             await self.scheduled_conversation()
+                        elif trigger_type == WakeWordType.SETTINGS:
+                            if await self.wake_word.open_setting_menu() == 'exit':
+                                # Replay the trigger logo when listening resumes
+                                self.wake_word.play_trigger = None
+                        elif trigger_type == WakeWordType.STOP_PLAYBACK:
+                            self.audio_player.stop_playback()
                     elif trigger_type == WakeWordType.OTHER:
                         await self.cleanup()
                         break
@@ -116,7 +158,43 @@ class SpeakerCore:
             if not cleanup_attempted:
                 await self.cleanup()
 
-    async def process_conversation(self):
+    async def record_question(self, start_index=None, pressed_at=None):
+        """Record one question; with streaming STT its segments are transcribed while it is spoken"""
+        if not self.streaming_stt:
+            return await self.py_recorder.record_question(
+                audio_player=self.audio_player, start_index=start_index, pressed_at=pressed_at
+            )
+
+        self.ai_client.start_partial_transcript()
+        frames = await self.py_recorder.record_question(
+            audio_player=self.audio_player,
+            start_index=start_index,
+            pressed_at=pressed_at,
+            on_segment=self.ai_client.submit_segment,
+            partial_transcript=self.ai_client.partial_transcript
+        )
+        if not frames:
+            self.ai_client.cancel_partial_transcript()
+        return frames
+
+    async def reply(self, frames):
+        """Answer a recorded question; a stop keyword heard meanwhile cuts the spoken reply short"""
+        if not self.wake_word.can_stop_playback():
+            return await self.ai_client.process_audio(frames, streamed=self.streaming_stt)
+
+        stop_task = asyncio.create_task(self.wake_word.listen_for_stop(self.py_recorder))
+        try:
+            return await self.ai_client.process_audio(frames, streamed=self.streaming_stt)
+        finally:
+            stop_task.cancel()
+            try:
+                await stop_task
+            except asyncio.CancelledError:
+                pass
+            except Exception as e:
+                core_logger.error(f"Stop keyword listener failed: {e}")
+
+    async def process_conversation(self, start_index=None, pressed_at=None):
         conversation_active = True
         silence_count = 0
         max_silence = 2
@@ -125,17 +203,25 @@ class SpeakerCore:
         try:
             while conversation_active and not is_exit_event_set():
                 try:
-                    try:
-                        display_task = asyncio.create_task(
-                            self.display.start_listening_display(SatoruHappy)
-                        )
-                        await asyncio.wait_for(display_task, timeout=1.0)
-                    except asyncio.TimeoutError:
-                        core_logger.warning("Display start timed out, continuing...")
-                    except Exception as e:
-                        core_logger.error(f"Error starting display: {e}")
+                    display_task = asyncio.create_task(
+                        self.display.start_listening_display(SatoruHappy)
+                    )
+                    # Push-to-talk, and a wake word without acknowledgement, start recording straight
+                    # away from the captured audio; the display catches up
+                    immediate = pressed_at is not None or (
+                        start_index is not None and not self.wake_word.acknowledge_wake_word)
+                    if not immediate:
+                        try:
+                            await asyncio.wait_for(display_task, timeout=1.0)
+                        except asyncio.TimeoutError:
+                            core_logger.warning("Display start timed out, continuing...")
+                        except Exception as e:
+                            core_logger.error(f"Error starting display: {e}")
                     
-                    frames = await self.py_recorder.record_question(audio_player=self.audio_player)
+                    # The first turn picks up the audio captured since the wake word or button press
+                    frames = await self.record_question(start_index=start_index, pressed_at=pressed_at)
+                    start_index = None
+                    pressed_at = None
 
                     if not frames:
                         silence_count += 1
@@ -147,8 +233,6 @@ class SpeakerCore:
                         continue
 
                     silence_count = 0
-                    input_audio_file = AIOutputAudio
-                    self.py_recorder.save_audio(frames, input_audio_file)
 
                     try:
                         await asyncio.wait_for(
@@ -159,7 +243,7 @@ class SpeakerCore:
                         core_logger.warning("Display stop timed out")
 
                     try:
-                        conversation_ended = await self.ai_client.process_audio(input_audio_file)
+                        conversation_ended = await self.reply(frames)
                         if conversation_ended:
                             conversation_active = False
                     except Exception as e:
@@ -212,7 +296,7 @@ class SpeakerCore:
                     except Exception as e:
                         core_logger.error(f"Error starting display: {e}")
 
-                    frames = await self.py_recorder.record_question(audio_player=self.audio_player)
+                    frames = await self.record_question()
 
                     if not frames:
                         silence_count += 1
@@ -224,8 +308,6 @@ class SpeakerCore:
                         continue
 
                     silence_count = 0
-                    input_audio_file = AIOutputAudio
-                    self.py_recorder.save_audio(frames, input_audio_file)
 
                     try:
                         await asyncio.wait_for(
@@ -236,7 +318,7 @@ class SpeakerCore:
                         core_logger.warning("Display stop timed out")
 
                     try:
-                        conversation_ended = await self.ai_client.process_audio(input_audio_file)
+                        conversation_ended = await self.reply(frames)
                         if conversation_ended:
                             conversation_active = False
                     except Exception as e:
@@ -291,6 +373,7 @@ class SpeakerCore:
             # Add wake word cleanup
             if self.wake_word:
                 cleanup_tasks.append(asyncio.create_task(self.wake_word.cleanup_recorder()))
+                cleanup_tasks.append(asyncio.create_task(self.wake_word.cleanup_engine()))
             
             # Add audio player cleanup
             if self.audio_player:
@@ -326,6 +409,13 @@ class SpeakerCore:
                 except Exception as e:
                     core_logger.error(f"Error during cleanup tasks: {e}")
             
+            # Release the microphone once nothing is subscribed to it
+            if self.microphone:
+                try:
+                    self.microphone.close()
+                except Exception as e:
+                    core_logger.error(f"Error closing microphone: {e}")
+
             # Final display cleanup attempt
             if self.display:
                 try:
@@ -340,6 +430,7 @@ class SpeakerCore:
             self.wake_word = None
             self.audio_player = None
             self.py_recorder = None
+            self.microphone = None
             self.display = None
             self.display_manager = None
             
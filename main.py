@@ -81,6 +81,117 @@ class Application:
             default=self.server_manager
         )
 
+        # Wake word arguments
+        parser.add_argument(
+            '--wake-engine',
+            choices=['porcupine', 'cascade', 'whisper'],
+            help='Wake word engine (porcupine runs on-device, cascade verifies local candidates '
+                 'with whisper, both fall back to whisper)',
+            default=os.environ.get('WAKE_WORD_ENGINE', 'porcupine')
+        )
+        parser.add_argument(
+            '--no-wake-ack',
+            action='store_true',
+            help='Skip the acknowledgement sound and record the question straight after the wake word'
+        )
+        parser.add_argument(
+            '--wake-preroll',
+            type=float,
+            help='Seconds of audio before the question start (wake word end or button press) that '
+                 'recording may still pick up; at most the 5 s the microphone ring holds',
+            default=float(os.environ.get('WAKE_PREROLL_SECONDS', WAKE_PREROLL_SECONDS))
+        )
+
+        parser.add_argument(
+            '--wake-process',
+            action='store_true',
+            help='Capture audio and run wake word detection in a separate process (shared-memory ring buffer)'
+        )
+
+        # Capture device
+        input_device = os.environ.get('INPUT_DEVICE_INDEX')
+        parser.add_argument(
+            '--input-device',
+            type=int,
+            help='PyAudio index of the input device (default: the system default input)',
+            default=int(input_device) if input_device else None
+        )
+        parser.add_argument(
+            '--native-rate',
+            action='store_true',
+            help=f'Always capture at the input device\'s default rate and resample to {RATE} Hz in-process; '
+                 f'by default this only happens when the device cannot be opened at {RATE} Hz or is a raw '
+                 'hw: device (cost is logged as capture.resample_us)'
+        )
+
+        # Voice activity detection
+        parser.add_argument(
+            '--vad',
+            choices=['energy', 'spectral'],
+            help='Voice activity backend for recording and the wake word gate '
+                 '(per-chunk CPU cost is logged as vad.<name>.chunk_us)',
+            default=os.environ.get('VAD_BACKEND', 'energy')
+        )
+
+        parser.add_argument(
+            '--endpointing',
+            choices=['adaptive', 'fixed'],
+            help='How the end of a question is detected: trailing silence adapted to the utterance, '
+                 'or a fixed 2 s (silence waited is logged as endpoint.silence_ms)',
+            default=os.environ.get('ENDPOINTING', 'adaptive')
+        )
+        parser.add_argument(
+            '--trim-lead',
+            type=float,
+            help='Seconds kept before the first detected speech when a question is trimmed for upload',
+            default=float(os.environ.get('TRIM_LEAD_SECONDS', TRIM_LEAD_SECONDS))
+        )
+        parser.add_argument(
+            '--trim-trail',
+            type=float,
+            help='Seconds kept after the last detected speech when a question is trimmed for upload',
+            default=float(os.environ.get('TRIM_TRAIL_SECONDS', TRIM_TRAIL_SECONDS))
+        )
+        parser.add_argument(
+            '--noise-suppression',
+            action='store_true',
+            help='Apply spectral-subtraction noise suppression to recorded questions '
+                 '(per-chunk CPU cost is logged as denoise.chunk_us)'
+        )
+        parser.add_argument(
+            '--agc',
+            action='store_true',
+            help='Apply automatic gain control to recorded questions before upload; the VAD still sees '
+                 'the raw audio (per-chunk CPU cost is logged as agc.chunk_us)'
+        )
+        parser.add_argument(
+            '--stt-codec',
+            choices=['flac', 'opus', 'wav'],
+            help='Encoding of recorded speech sent to Whisper; flac and opus need the soundfile package '
+                 '(bytes per request are logged as stt.upload_bytes)',
+            default=os.environ.get('STT_CODEC', 'flac')
+        )
+        parser.add_argument(
+            '--streaming-stt',
+            action='store_true',
+            help='Transcribe the question in segments while the user is still speaking '
+                 '(remaining wait after the endpoint is logged as stt.tail_ms)'
+        )
+
+        # Presence duty cycling
+        parser.add_argument(
+            '--presence-idle-minutes',
+            type=float,
+            help='Minutes without motion before wake word detection drops to local energy only (0 disables)',
+            default=float(os.environ.get('PRESENCE_IDLE_MINUTES', PRESENCE_IDLE_MINUTES))
+        )
+        parser.add_argument(
+            '--presence-poll-seconds',
+            type=float,
+            help='Motion sensor poll interval in seconds',
+            default=float(os.environ.get('PRESENCE_POLL_SECONDS', PRESENCE_POLL_SECONDS))
+        )
+
         return parser.parse_args()
 
     async def cleanup(self):
@@ -0,0 +1,65 @@
+from utils import metrics
+
+import logging
+import time
+
+logging.basicConfig(level=logging.INFO)
+presence_logger = logging.getLogger(__name__)
+
+class PresenceMonitor:
+    """Tracks room presence from the PIR motion sensor to duty-cycle wake word detection
+
+    After idle_minutes without motion the monitor goes idle: WakeWord then runs
+    only the local energy gate (no engine, no cloud calls) and the backlight is
+    dimmed. Motion on the next sensor poll, or speech energy picked up by the
+    gate, switches straight back to full detection. idle_minutes=0 disables it.
+    """
+    def __init__(self, server, display_manager=None, idle_minutes=10, poll_interval=2.0, idle_brightness=10):
+        self.server = server
+        self.display_manager = display_manager
+        self.idle_seconds = idle_minutes * 60
+        self.poll_interval = poll_interval
+        self.idle_brightness = idle_brightness
+
+        self.idle = False
+        self.last_motion_time = time.monotonic()
+        self.last_poll_time = 0.0
+        metrics.set_gauge('presence.idle', 0)
+
+    @property
+    def enabled(self):
+        return self.idle_seconds > 0
+
+    async def poll(self):
+        """Read the motion sensor if a poll is due and update the idle state"""
+        now = time.monotonic()
+        if not self.enabled or now - self.last_poll_time < self.poll_interval:
+            return self.idle
+        self.last_poll_time = now
+
+        sensors = await self.server.get_sensors()
+        # A failed read counts as presence, so a broken sensor never leaves detection idle
+        if sensors.get('motion', True):
+            await self.note_activity(reason="motion")
+        elif not self.idle and now - self.last_motion_time >= self.idle_seconds:
+            await self._set_idle(True, reason=f"no motion for {self.idle_seconds // 60:.0f} min")
+        return self.idle
+
+    async def note_activity(self, reason="activity"):
+        self.last_motion_time = time.monotonic()
+        if self.idle:
+            await self._set_idle(False, reason=reason)
+
+    async def _set_idle(self, idle, reason):
+        self.idle = idle
+        metrics.set_gauge('presence.idle', int(idle))
+        metrics.increment('presence.idle_entered' if idle else 'presence.idle_exited')
+        presence_logger.info(f"Presence {'idle' if idle else 'active'} ({reason})")
+
+        if self.display_manager is None:
+            return
+        try:
+            brightness = self.idle_brightness if idle else self.display_manager.current_brightness
+            await self.display_manager.apply_brightness(brightness)
+        except Exception as e:
+            presence_logger.error(f"Error changing backlight: {e}")
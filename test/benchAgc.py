@@ -0,0 +1,46 @@
+"""Per-chunk cost and output levels of the automatic gain control stage (audio/agc.py)
+
+Turns alternate between a quiet and a loud synthetic speaker, with noisy gaps.
+
+    python test/benchAgc.py [--seconds 32] [--chunk 480] [--noise 150]
+"""
+import numpy as np
+
+from benchUtils import (RATE, bench_parser, chunked, cpu_report, rms, sample_times, synthetic_voice, time_chunks,
+                        to_int16)
+from audio.agc import AutomaticGainControl
+
+def make_audio(seconds, noise_level):
+    rng = np.random.default_rng(0)
+    t = sample_times(seconds)
+    # 4 s turns: 1 s gap, then 3 s of speech, alternating quiet (far from the mic) and loud
+    turn = (t // 4).astype(int)
+    speaking = (t % 4) >= 1
+    level = np.where(turn % 2 == 0, 300, 9000)
+    noise = rng.normal(0, noise_level, len(t))
+    return to_int16(synthetic_voice(t) * level * speaking + noise), speaking, turn
+
+def main():
+    parser = bench_parser(__doc__, seconds=32)
+    parser.add_argument('--noise', type=float, default=150, help='Background noise RMS (above the AGC gate_rms)')
+    args = parser.parse_args()
+
+    audio, speaking, turn = make_audio(args.seconds, args.noise)
+    agc = AutomaticGainControl(rate=RATE)
+    chunks = chunked(audio, args.chunk)
+    outputs, cpu = time_chunks(agc.process, chunks)
+    out = np.concatenate(outputs)
+    count = len(out)
+    print(cpu_report(cpu, len(chunks), args.seconds))
+
+    # Skip the first half second of each turn while the gain settles
+    settled = speaking[:count] & (sample_times(args.seconds)[:count] % 4 >= 1.5)
+    for name, parity in (("quiet", 0), ("loud", 1)):
+        mask = settled & (turn[:count] % 2 == parity)
+        print(f"{name:6} speech rms {rms(audio[:count][mask]):8.1f} -> {rms(out[mask]):8.1f}")
+    gaps = ~speaking[:count]
+    print(f"gap noise rms {rms(audio[:count][gaps]):8.1f} -> {rms(out[gaps]):8.1f}")
+    print(f"output peak {int(np.abs(out.astype(np.int32)).max())}")
+
+if __name__ == "__main__":
+    main()
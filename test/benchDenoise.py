@@ -0,0 +1,64 @@
+"""Per-chunk cost and noise reduction of the spectral-subtraction stage (audio/denoise.py)
+
+A synthetic voice in fan-like noise goes through PyRecorder's VAD, noise floor
+and enhance() as in record_question; SNR is measured against the clean voice.
+
+    python test/benchDenoise.py [--seconds 30] [--chunk 480] [--noise 300]
+"""
+import time
+
+import numpy as np
+from scipy.signal import butter, sosfilt
+
+from benchUtils import RATE, bench_parser, cpu_report, sample_times, synthetic_voice, to_int16
+from audio.recorder import PyRecorder
+
+def make_audio(seconds, noise_level, lead_seconds=2.0):
+    rng = np.random.default_rng(0)
+    t = sample_times(seconds)
+    voice = synthetic_voice(t) * 2500
+    voice *= (np.sin(2 * np.pi * 0.4 * t) > 0) & (t >= lead_seconds)
+    # Broadband noise below 2 kHz plus a hum
+    fan = sosfilt(butter(2, 2000 / (RATE / 2), output='sos'), rng.normal(0, noise_level * 2, len(t)))
+    fan += 0.3 * noise_level * np.sin(2 * np.pi * 120 * t)
+    return voice, voice + fan
+
+def snr_db(clean, signal):
+    noise = signal - clean
+    return 10 * np.log10(np.sum(clean ** 2) / np.sum(noise ** 2))
+
+def main():
+    parser = bench_parser(__doc__)
+    parser.add_argument('--noise', type=float, default=300, help='Noise level (int16 RMS scale)')
+    args = parser.parse_args()
+
+    _, warmup = make_audio(5.0, args.noise, lead_seconds=5.0)
+    clean, noisy = make_audio(args.seconds, args.noise)
+    noisy = to_int16(noisy)
+
+    recorder = PyRecorder(None, noise_suppression=True)
+    # The wake word loop keeps the noise floor current before a question starts
+    warmup = to_int16(warmup)
+    for i in range(0, len(warmup) - args.chunk + 1, args.chunk):
+        recorder.update_noise_floor(warmup[i:i + args.chunk])
+
+    out = noisy[:len(noisy) // args.chunk * args.chunk].copy()
+    speech_started = False
+    start = time.process_time()
+    for i in range(0, len(out), args.chunk):
+        data = out[i:i + args.chunk]
+        speaking, energy = recorder.vad.process(data)
+        recorder.update_noise_floor(data, energy)
+        speech_started = speech_started or speaking
+        recorder.enhance(data, speech_started, energy)
+    cpu = time.process_time() - start
+    print(cpu_report(cpu, len(out) // args.chunk, args.seconds))
+
+    delay = recorder.denoiser.frame_length
+    speech = slice(int(2.0 * RATE), len(out) - delay)
+    reference = clean[speech]
+    print(f"SNR before {snr_db(reference, noisy[speech].astype(float)):6.2f} dB  "
+          f"after {snr_db(reference, out[speech.start + delay:speech.stop + delay].astype(float)):6.2f} dB")
+
+if __name__ == "__main__":
+    main()
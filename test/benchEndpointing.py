@@ -0,0 +1,115 @@
+"""Turn latency of the question endpointers over a replay corpus
+
+Each WAV (16 kHz mono, one question, then at least 2 s of silence) is replayed
+through PyRecorder's VAD and every endpointer in audio/endpoint.py. Latency runs
+from the end of speech (clip.json {"speech_end": 2.35}, else the last VAD speech
+chunk) to the endpoint; an endpoint before it is a truncation.
+
+    python test/benchEndpointing.py path/to/corpus [--vad energy] [--json report.json]
+"""
+import argparse
+import glob
+import json
+import os
+import wave
+
+import numpy as np
+
+from benchUtils import RATE
+from audio.endpoint import ENDPOINTERS
+from audio.recorder import PyRecorder
+from utils.define import CHANNELS
+
+def load_corpus(corpus_dir):
+    items = []
+    for wav_path in sorted(glob.glob(os.path.join(corpus_dir, "**", "*.wav"), recursive=True)):
+        with wave.open(wav_path, 'rb') as wf:
+            if (wf.getframerate(), wf.getnchannels(), wf.getsampwidth()) != (RATE, CHANNELS, 2):
+                print(f"Skipping {wav_path}: expected {RATE} Hz mono 16-bit")
+                continue
+            pcm = wf.readframes(wf.getnframes())
+        speech_end = None
+        label_path = os.path.splitext(wav_path)[0] + ".json"
+        if os.path.exists(label_path):
+            with open(label_path) as f:
+                speech_end = json.load(f).get('speech_end')
+        items.append((wav_path, pcm, speech_end))
+    return items
+
+def vad_decisions(py_recorder, pcm):
+    """Per-chunk (speaking, energy) as record_question sees them, after the noise floor has settled"""
+    chunk_bytes = py_recorder.CHUNK_SIZE * 2
+    chunks = [pcm[i:i + chunk_bytes] for i in range(0, len(pcm) - chunk_bytes + 1, chunk_bytes)]
+    # The wake word gate keeps the noise floor current before a question starts
+    for chunk in chunks:
+        py_recorder.update_noise_floor(chunk)
+    py_recorder.vad.reset()
+
+    decisions = []
+    for chunk in chunks:
+        speaking, energy = py_recorder.vad.process(chunk)
+        py_recorder.update_noise_floor(chunk, energy)
+        decisions.append((speaking, energy))
+    return decisions
+
+def run_endpointer(endpointer, decisions):
+    """Index of the chunk at which the endpointer fires, or None"""
+    endpointer.reset()
+    for index, (speaking, energy) in enumerate(decisions):
+        if endpointer.update(speaking, energy):
+            return index
+    return None
+
+def summarize(latencies_ms):
+    if not latencies_ms:
+        return {}
+    values = np.array(latencies_ms)
+    return {
+        'p50_ms': float(np.percentile(values, 50)),
+        'p90_ms': float(np.percentile(values, 90)),
+        'mean_ms': float(values.mean()),
+        'max_ms': float(values.max()),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('corpus', help='Directory of question WAV files')
+    parser.add_argument('--vad', default='energy', help='VAD backend (audio/vad.py)')
+    parser.add_argument('--json', help='Also write the report to this file')
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    report = {}
+    for name in ENDPOINTERS:
+        latencies, truncated, missed = [], [], []
+        for wav_path, pcm, speech_end in corpus:
+            py_recorder = PyRecorder(microphone=None, vad=args.vad, endpointing=name)
+            chunk_seconds = py_recorder.CHUNK_SIZE / RATE
+            decisions = vad_decisions(py_recorder, pcm)
+            speech_chunks = [i for i, (speaking, _) in enumerate(decisions) if speaking]
+            if not speech_chunks:
+                continue
+            if speech_end is None:
+                speech_end = (speech_chunks[-1] + 1) * chunk_seconds
+
+            end_index = run_endpointer(py_recorder.endpointer, decisions)
+            if end_index is None:
+                missed.append(wav_path)
+                continue
+            endpoint_time = (end_index + 1) * chunk_seconds
+            if endpoint_time < speech_end:
+                truncated.append(wav_path)
+            else:
+                latencies.append((endpoint_time - speech_end) * 1000)
+
+        report[name] = dict(summarize(latencies), turns=len(latencies),
+                            truncated=len(truncated), no_endpoint=len(missed))
+        print(f"{name:9} " + "  ".join(f"{key}={value:.0f}" if isinstance(value, float) else f"{key}={value}"
+                                       for key, value in report[name].items()))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Compare chunked linear interpolation (testPico.py) with StreamingResampler (audio/resample.py)
+
+A 1 kHz plus a 9.5 kHz tone (above the 8 kHz output Nyquist) is brought from
+the device rate to 16 kHz; alias rejection is the 1 kHz level over the
+strongest other output component.
+
+    python test/benchResampler.py [--rate 48000] [--seconds 20] [--chunk-ms 16]
+"""
+import argparse
+
+import numpy as np
+
+from benchUtils import RATE, chunked, cpu_report, time_chunks
+from audio.resample import StreamingResampler
+
+def linear_interp(audio_data, orig_rate, new_rate):
+    """What test/testPico.py does per chunk"""
+    duration = len(audio_data) / orig_rate
+    time_old = np.linspace(0, duration, len(audio_data))
+    time_new = np.linspace(0, duration, int(len(audio_data) * new_rate / orig_rate))
+    return np.interp(time_new, time_old, audio_data).astype(np.int16)
+
+def alias_rejection_db(output):
+    segment = output[RATE:RATE + 16384].astype(np.float64) * np.hanning(16384)
+    spectrum = np.abs(np.fft.rfft(segment))
+    tone = np.argmin(np.abs(np.fft.rfftfreq(16384, 1 / RATE) - 1000))
+    others = np.delete(spectrum, range(tone - 8, tone + 9))
+    return 20 * np.log10(spectrum[tone] / others.max())
+
+def bench(name, resample, chunks, seconds):
+    outputs, cpu = time_chunks(resample, chunks)
+    print(f"{name:10} {cpu_report(cpu, len(chunks), seconds)}  "
+          f"alias rejection {alias_rejection_db(np.concatenate(outputs)):6.1f} dB")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rate', type=int, default=48000, help='Native device rate')
+    parser.add_argument('--seconds', type=float, default=20)
+    parser.add_argument('--chunk-ms', type=float, default=16,
+                        help='Capture chunk (MicrophoneBus uses 256 samples at 16 kHz)')
+    args = parser.parse_args()
+
+    t = np.arange(int(args.seconds * args.rate)) / args.rate
+    audio = (8000 * np.sin(2 * np.pi * 1000 * t) + 8000 * np.sin(2 * np.pi * 9500 * t)).astype(np.int16)
+    chunks = chunked(audio, int(args.rate * args.chunk_ms / 1000))
+
+    bench("interp", lambda chunk: linear_interp(chunk, args.rate, RATE), chunks, args.seconds)
+    bench("polyphase", StreamingResampler(args.rate, RATE).process, chunks, args.seconds)
+
+if __name__ == "__main__":
+    main()
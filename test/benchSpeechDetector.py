@@ -0,0 +1,53 @@
+"""Compare per-chunk speech energy: old per-call filter design vs StreamingSpeechDetector
+
+Also times every VAD backend (audio/vad.py VAD_BACKENDS) on the same chunks.
+
+    python test/benchSpeechDetector.py [--seconds 60] [--chunk 480]
+"""
+import numpy as np
+from scipy.signal import butter, lfilter
+
+from benchUtils import RATE, bench_parser, chunked, cpu_report, sample_times, time_chunks
+from audio.recorder import PyRecorder
+from audio.vad import VAD_BACKENDS, StreamingSpeechDetector
+
+def old_energy(audio_chunk):
+    """What PyRecorder.is_speech did per chunk: redesign the filter, filter from rest"""
+    nyq = 0.5 * RATE
+    b, a = butter(5, [300 / nyq, 3000 / nyq], btype='band')
+    filtered_audio = lfilter(b, a, audio_chunk)
+    return np.sum(filtered_audio**2) / len(filtered_audio)
+
+def make_audio(seconds):
+    rng = np.random.default_rng(0)
+    t = sample_times(seconds)
+    speech = 3000 * np.sin(2 * np.pi * 440 * t) * (np.sin(2 * np.pi * 0.5 * t) > 0)
+    return (speech + rng.normal(0, 200, len(t))).astype(np.int16)
+
+def bench(name, energy, chunks, audio_seconds):
+    energies, cpu = time_chunks(energy, chunks)
+    print(f"{name:10} {cpu_report(cpu, len(chunks), audio_seconds)}")
+    return np.array(energies)
+
+def main():
+    args = bench_parser(__doc__, seconds=60).parse_args()
+
+    int_chunks = chunked(make_audio(args.seconds), args.chunk)
+    chunks = [chunk.tobytes() for chunk in int_chunks]
+
+    old = bench("old", old_energy, int_chunks, args.seconds)
+    detector = StreamingSpeechDetector(rate=RATE)
+    new = bench("streaming", detector.energy, chunks, args.seconds)
+
+    # Old energies include the filter start-up transient at every chunk edge
+    edge_bias = np.median(old / np.maximum(new, 1e-9))
+    print(f"median old/streaming energy ratio: {edge_bias:.3f}")
+
+    print("VAD backends:")
+    for name in VAD_BACKENDS:
+        py_recorder = PyRecorder(microphone=None, vad=name)
+        py_recorder.silence_energy, py_recorder.energy_threshold = 200.0 ** 2, 2 * 200.0 ** 2
+        bench(name, py_recorder.vad.analyse, int_chunks, args.seconds)
+
+if __name__ == "__main__":
+    main()
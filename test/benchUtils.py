@@ -0,0 +1,47 @@
+"""Shared synthetic audio and timing helpers for the test/bench*.py scripts
+
+The scripts are run from the repository root, e.g. python test/benchAgc.py
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.define import RATE
+
+def bench_parser(doc, seconds=30):
+    """Argument parser with the common --seconds and --chunk options"""
+    parser = argparse.ArgumentParser(description=doc.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=seconds)
+    parser.add_argument('--chunk', type=int, default=480, help='Samples per chunk (PyRecorder uses 480)')
+    return parser
+
+def sample_times(seconds, rate=RATE):
+    return np.arange(int(seconds * rate)) / rate
+
+def synthetic_voice(t, rate=RATE):
+    """Unit-amplitude voiced sound: 14 harmonics of a pitch wobbling around 140 Hz"""
+    phase = 2 * np.pi * np.cumsum(140 + 20 * np.sin(2 * np.pi * 3 * t)) / rate
+    return sum(np.sin(k * phase) / k for k in range(1, 15))
+
+def to_int16(x):
+    return np.clip(np.rint(x), -32768, 32767).astype(np.int16)
+
+def rms(x):
+    return float(np.sqrt(np.mean(np.asarray(x, dtype=np.float64) ** 2)))
+
+def chunked(audio, chunk):
+    """Consecutive whole chunks of audio (views)"""
+    return [audio[i:i + chunk] for i in range(0, len(audio) - chunk + 1, chunk)]
+
+def time_chunks(process, chunks):
+    """Run process on every chunk, return (results, CPU seconds)"""
+    start = time.process_time()
+    results = [process(chunk) for chunk in chunks]
+    return results, time.process_time() - start
+
+def cpu_report(cpu, n_chunks, audio_seconds):
+    return f"{cpu / n_chunks * 1e6:8.1f} us/chunk  {cpu / audio_seconds * 100:6.3f} % of one core"
@@ -0,0 +1,37 @@
+"""EnergyOnsetDetector keeps flagging speech after a lasting rise in background noise
+
+    python test/testOnset.py
+"""
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from wakeword.engine import EnergyOnsetDetector
+
+FRAME = 512
+
+def onsets(detector, audio):
+    return [i for i in range(0, len(audio) - FRAME + 1, FRAME) if detector.update(audio[i:i + FRAME])]
+
+def test_speech_after_noise_step():
+    rng = np.random.default_rng(0)
+    rate = 16000
+    quiet = rng.normal(0, 100, 3 * rate)
+    # TV-level noise from here on: far more than onset_ratio above the quiet room
+    tv = rng.normal(0, 1000, 14 * rate)
+    t = np.arange(len(tv)) / rate
+    speech = np.where((t >= 6) & (t % 2 < 0.6), 6000 * np.sin(2 * np.pi * 200 * t), 0)
+    audio = np.concatenate((quiet, tv + speech)).astype(np.int16)
+
+    detector = EnergyOnsetDetector(max_active_frames=62)
+    found = onsets(detector, audio)
+    speech_onsets = [i for i in found if i >= (3 + 5) * rate]
+    # One burst every 2 s from 6 s into the noise: 6, 8, 10, 12 s
+    assert len(speech_onsets) == 4, found
+    assert not detector.active
+
+if __name__ == "__main__":
+    test_speech_after_noise_step()
+    print("ok")
@@ -57,10 +57,35 @@ PicoWakeWordSatoru = os.path.join(VOICE_TRIGGER_DIR,"pico_voice_wake_word_satoru
 ToshibaVoiceDictionary = os.path.join(VOICE_TRIGGER_DIR,"toshiba_voice_dict_jaJP.vtdic")
 ToshibaVoiceLibrary = os.path.join(VOICE_TRIGGER_DIR,"libVT_ARML64h.so")
 
+# wake word detection windows (overlapping: a new window every hop)
+WAKE_WINDOW_SECONDS = 2
+WAKE_HOP_SECONDS = 0.5
+
+# hardware buttons are polled between capture chunks at this interval (bounds push-to-talk latency)
+BUTTON_POLL_SECONDS = 0.1
+
+# audio kept from before the question starts (wake word end, or end of the acknowledgement sound)
+WAKE_PREROLL_SECONDS = 1.5
+
+# audio kept around the detected speech when a question is trimmed for upload
+TRIM_LEAD_SECONDS = 0.3   # before the first speech chunk
+TRIM_TRAIL_SECONDS = 0.4  # after the last speech chunk
+
+# presence duty cycling (PIR motion sensor)
+PRESENCE_IDLE_MINUTES = 10     # minutes without motion before wake detection goes low-cost, 0 disables
+PRESENCE_POLL_SECONDS = 2      # motion sensor poll interval
+PRESENCE_IDLE_BRIGHTNESS = 10  # backlight while idle
+
+# metrics
+METRICS_LOG_INTERVAL = 5 * 60  # log a metrics snapshot every 5 minutes
+
 # font
 NotoSansFont = os.path.join(FONT_DIR,"NotoSansCJK-Regular.ttc")
 
 class WakeWordType(str, Enum):
     TRIGGER = auto()
     SCHEDULE = auto()
+    SETTINGS = auto()
+    STOP_PLAYBACK = auto()
+    PUSH_TO_TALK = auto()
     OTHER = auto()
@@ -0,0 +1,45 @@
+import logging
+import threading
+
+logging.basicConfig(level=logging.INFO)
+metrics_logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+_timings = {}
+
+def increment(name, value=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+def set_gauge(name, value):
+    with _lock:
+        _gauges[name] = value
+
+def observe(name, value):
+    """Record one sample (e.g. a duration in ms) into a count/total/max summary"""
+    with _lock:
+        summary = _timings.setdefault(name, {'count': 0, 'total': 0.0, 'max': 0.0})
+        summary['count'] += 1
+        summary['total'] += value
+        summary['max'] = max(summary['max'], value)
+
+def get_counter(name):
+    with _lock:
+        return _counters.get(name, 0)
+
+def snapshot():
+    with _lock:
+        timings = {
+            name: {
+                'count': summary['count'],
+                'avg': summary['total'] / summary['count'] if summary['count'] else 0.0,
+                'max': summary['max']
+            }
+            for name, summary in _timings.items()
+        }
+        return {'counters': dict(_counters), 'gauges': dict(_gauges), 'timings': timings}
+
+def log_metrics():
+    metrics_logger.info(f"Metrics: {snapshot()}")
@@ -1,4 +1,5 @@
 import asyncio
+import io
 import logging
 import wave
 
@@ -18,4 +19,16 @@ def create_empty_wav_file(file_path):
         wav_file.setnchannels(1)  # Mono
         wav_file.setsampwidth(2)  # 2 bytes per sample
         wav_file.setframerate(44100)  # 44.1kHz sampling rate
-        wav_file.writeframes(b'')  # Empty audio data
\ No newline at end of file
+        wav_file.writeframes(b'')  # Empty audio data
+
+def encode_wav_bytes(pcm, rate=16000, channels=1, name="speech.wav"):
+    """Wrap 16-bit PCM (bytes, memoryview or int16 array) in an in-memory WAV file"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav_file:
+        wav_file.setnchannels(channels)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(rate)
+        wav_file.writeframes(pcm)
+    buffer.seek(0)
+    buffer.name = name
+    return buffer
\ No newline at end of file
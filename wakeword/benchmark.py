@@ -0,0 +1,201 @@
+"""Offline wake word benchmark over a labeled WAV corpus
+
+Every WAV in the corpus directory (16 kHz, mono, 16-bit) is fed chunk by
+chunk through the same WakeWordDetector used by WakeWord.listen_for_wake_word.
+Keyword occurrences are labeled in a JSON sidecar next to each file
+(clip.wav -> clip.json); files without one are treated as keyword-free:
+
+    {"keywords": [{"name": "konnichiwa", "start": 1.20, "end": 1.85}]}
+
+By default the Whisper call is replaced by StubSpeechClient, which "hears" a
+keyword phrase only when a labeled occurrence lies inside the window, so runs
+are deterministic and offline. Use --live-stt to send windows to the real API.
+
+    python -m wakeword.benchmark path/to/corpus --engine cascade
+"""
+from audio.recorder import PyRecorder
+from utils import metrics
+from utils.define import CHANNELS, RATE, WAKE_WINDOW_SECONDS
+from wakeword.detector import WakeWordDetector
+from wakeword.engine import create_wake_word_engine
+from wakeword.keywords import DEFAULT_KEYWORDS, KeywordRegistry
+
+import argparse
+import asyncio
+import glob
+import json
+import logging
+import os
+import time
+import wave
+
+logging.basicConfig(level=logging.INFO)
+benchmark_logger = logging.getLogger(__name__)
+
+class StubSpeechClient:
+    """Deterministic stand-in for ConversationClient.speech_to_text
+
+    The harness sets position (the sample index the window ends at) before
+    each check; the transcript lists the phrase of every labeled keyword
+    fully inside [position - window_length, position].
+    """
+    def __init__(self, registry, window_length):
+        self.registry = registry
+        self.window_length = window_length
+        self.labels = []
+        self.position = 0
+        self.requests = 0
+
+    def speech_to_text(self, audio):
+        self.requests += 1
+        start = self.position - self.window_length
+        words = []
+        for label in self.labels:
+            if start <= label['start_index'] and label['end_index'] <= self.position:
+                words.append(label.get('text') or self._phrase_for(label['name']))
+        return " ".join(words)
+
+    def _phrase_for(self, name):
+        keyword = self.registry.get(name)
+        return keyword.phrases[0] if keyword else name
+
+def load_corpus(corpus_dir):
+    items = []
+    for wav_path in sorted(glob.glob(os.path.join(corpus_dir, "**", "*.wav"), recursive=True)):
+        with wave.open(wav_path, 'rb') as wf:
+            if (wf.getframerate(), wf.getnchannels(), wf.getsampwidth()) != (RATE, CHANNELS, 2):
+                benchmark_logger.warning(f"Skipping {wav_path}: expected {RATE} Hz mono 16-bit")
+                continue
+            pcm = wf.readframes(wf.getnframes())
+
+        labels = []
+        label_path = os.path.splitext(wav_path)[0] + ".json"
+        if os.path.exists(label_path):
+            with open(label_path) as f:
+                for label in json.load(f).get('keywords', []):
+                    label = dict(label)
+                    label['start_index'] = int(label['start'] * RATE)
+                    label['end_index'] = int(label['end'] * RATE)
+                    labels.append(label)
+        items.append((wav_path, pcm, labels))
+    return items
+
+async def run_file(detector, stub, pcm, labels, chunk_size):
+    """Feed one file through the detector, return [(keyword, end_index)] detections"""
+    if stub is not None:
+        stub.labels = labels
+    detections = []
+    chunk_bytes = chunk_size * 2
+    position = 0
+    detector.reset()
+
+    for offset in range(0, len(pcm) - chunk_bytes + 1, chunk_bytes):
+        position += chunk_size
+        if not detector.push(pcm[offset:offset + chunk_bytes]):
+            continue
+        if stub is not None:
+            stub.position = position
+
+        keyword = await detector.detect(end_index=position)
+        if detector.worker:
+            # Offline input arrives faster than real time; settle each window before the next
+            await detector.worker.queue.join()
+            keyword = detector.worker.detected_keyword
+        if keyword:
+            detections.append((keyword, detector.worker.detected_index if detector.worker else position))
+            # Live listening stops here for the conversation; start the next one fresh
+            detector.reset()
+    return detections
+
+def score(results, tolerance_seconds):
+    tolerance = int(tolerance_seconds * RATE)
+    total_seconds = 0.0
+    occurrences = 0
+    accepted = 0
+    false_accepts = 0
+    delays = []
+
+    for pcm, labels, detections in results:
+        total_seconds += len(pcm) / 2 / RATE
+        occurrences += len(labels)
+        matched = set()
+        for keyword, end_index in detections:
+            hit = None
+            for i, label in enumerate(labels):
+                if (i not in matched and label['name'] == keyword.name and
+                        label['start_index'] <= end_index <= label['end_index'] + tolerance):
+                    hit = i
+                    break
+            if hit is None:
+                false_accepts += 1
+            else:
+                matched.add(hit)
+                delays.append((end_index - labels[hit]['end_index']) / RATE)
+        accepted += len(matched)
+
+    hours = total_seconds / 3600
+    return {
+        'audio_seconds': total_seconds,
+        'keyword_occurrences': occurrences,
+        'false_accepts': false_accepts,
+        'false_accepts_per_hour': false_accepts / hours if hours else 0.0,
+        'false_reject_rate': (occurrences - accepted) / occurrences if occurrences else 0.0,
+        'delay_mean_s': sum(delays) / len(delays) if delays else None,
+        'delay_max_s': max(delays) if delays else None,
+    }
+
+async def run_benchmark(corpus_dir, engine_name, live_stt=False, tolerance_seconds=WAKE_WINDOW_SECONDS + 0.5):
+    registry = KeywordRegistry(DEFAULT_KEYWORDS)
+    stub = None
+    if live_stt:
+        from aiclient.conversation import ConversationClient
+        ai_client = ConversationClient()
+    else:
+        stub = ai_client = StubSpeechClient(registry, int(WAKE_WINDOW_SECONDS * RATE))
+
+    engine = create_wake_word_engine(name=engine_name, ai_client=ai_client, keywords=registry)
+    if stub is not None:
+        stub.window_length = engine.window_length
+    py_recorder = PyRecorder(microphone=None)
+    detector = WakeWordDetector(engine, engine.verify, py_recorder=py_recorder)
+    detector.start()
+
+    results = []
+    cpu_start = time.process_time()
+    try:
+        for wav_path, pcm, labels in load_corpus(corpus_dir):
+            detections = await run_file(detector, stub, pcm, labels, engine.frame_length)
+            benchmark_logger.info(f"{os.path.basename(wav_path)}: {len(labels)} labeled, "
+                                  f"{len(detections)} detected")
+            results.append((pcm, labels, detections))
+    finally:
+        await detector.stop()
+        engine.cleanup()
+    cpu_seconds = time.process_time() - cpu_start
+
+    report = score(results, tolerance_seconds)
+    report['engine'] = engine.name
+    report['files'] = len(results)
+    report['cpu_seconds_per_audio_second'] = cpu_seconds / report['audio_seconds'] if report['audio_seconds'] else 0.0
+    report['stt_requests'] = stub.requests if stub is not None else metrics.get_counter('stt.requests')
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline wake word benchmark")
+    parser.add_argument('corpus', help='Directory of 16 kHz mono WAV files with optional JSON labels')
+    parser.add_argument('--engine', choices=['porcupine', 'cascade', 'whisper'], default='cascade')
+    parser.add_argument('--live-stt', action='store_true', help='Use the real speech-to-text API instead of the stub')
+    parser.add_argument('--tolerance', type=float, default=WAKE_WINDOW_SECONDS + 0.5,
+                        help='Seconds after a keyword ends that a detection still counts as a hit')
+    parser.add_argument('--json', help='Also write the report to this file')
+    args = parser.parse_args()
+
+    report = asyncio.run(run_benchmark(args.corpus, args.engine, args.live_stt, args.tolerance))
+    for key, value in report.items():
+        print(f"{key:32} {value:.4f}" if isinstance(value, float) else f"{key:32} {value}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+from audio.ringbuffer import SlidingWindow
+from wakeword.gate import SpeechGate
+from wakeword.worker import RecognitionWorker
+
+import logging
+
+logging.basicConfig(level=logging.INFO)
+detector_logger = logging.getLogger(__name__)
+
+class WakeWordDetector:
+    """Windowing, gating and checking of captured audio for one wake word engine
+
+    Shared by WakeWord.listen_for_wake_word and the offline benchmark so both
+    run exactly the same path: audio is pushed chunk by chunk into a sliding
+    window and the speech gate (which also keeps PyRecorder's noise floor
+    current), and each due window goes through the gate if the engine is
+    speech_gated, engine.nominate() and check (inline, or on a
+    RecognitionWorker for network engines).
+    """
+    def __init__(self, engine, check, py_recorder=None, track_noise_floor=True):
+        self.engine = engine
+        self.check = check  # async callable(window, candidate) -> WakeKeyword or None
+        self.py_recorder = py_recorder
+
+        self.sliding_window = SlidingWindow(engine.window_length, engine.hop_length)
+        self.speech_gate = None
+        if py_recorder is not None:
+            self.speech_gate = SpeechGate(py_recorder, engine.window_length, engine.hop_length,
+                                          track_noise_floor=track_noise_floor)
+        # Network verification runs beside capture so no audio is dropped while it is in flight
+        self.worker = RecognitionWorker(check) if engine.uses_network else None
+
+        self.detected_index = None
+        self.keyword_end_index = None  # Where the detected keyword is estimated to end (engine.keyword_lag)
+
+    def start(self):
+        if self.worker:
+            self.worker.start()
+
+    async def stop(self):
+        if self.worker:
+            await self.worker.stop()
+
+    def reset(self):
+        """Forget buffered audio, engine state and any detection, e.g. after a wake word was handled"""
+        self.sliding_window.reset()
+        self.engine.reset()
+        if self.speech_gate:
+            self.speech_gate.reset()
+        if self.worker:
+            self.worker.reset()
+        self.detected_index = None
+        self.keyword_end_index = None
+
+    def push(self, data, idle=False):
+        """Add one captured chunk, return True when the next window is due
+
+        The gate analyses every chunk whether or not presence is idle, since
+        it also keeps the noise floor current.
+        """
+        if self.speech_gate:
+            self.speech_gate.update(data)
+        return self.sliding_window.push(data)
+
+    def window(self):
+        return self.sliding_window.window()
+
+    def nominate(self):
+        """Run the cheap local stages on the current window, return the candidate or a falsy value"""
+        window = self.window()
+        # Skip silent windows before any file or network work
+        gated = self.engine.speech_gated and self.speech_gate is not None
+        return (not gated or self.speech_gate.allows(window)) and self.engine.nominate(window)
+
+    async def detect(self, end_index):
+        """Check the current window; end_index is the capture index of its last sample
+
+        Returns the detected WakeKeyword (setting detected_index and
+        keyword_end_index) or None. With a worker the result may belong to an
+        earlier window still in flight.
+        """
+        window = self.window()
+        candidate = self.nominate()
+
+        if self.worker:
+            if candidate:
+                self.worker.submit(window, end_index=end_index, candidate=candidate,
+                                   keyword_end=end_index - self.engine.keyword_lag)
+            self.detected_index = self.worker.detected_index
+            self.keyword_end_index = self.worker.keyword_end_index
+            return self.worker.detected_keyword
+
+        keyword = await self.check(window, candidate) if candidate else None
+        if keyword:
+            self.detected_index = end_index
+            self.keyword_end_index = end_index - self.engine.keyword_lag
+        return keyword
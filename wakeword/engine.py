@@ -0,0 +1,369 @@
+from utils.define import *
+from wakeword.keywords import WakeKeyword
+
+import asyncio
+import logging
+import numpy as np
+import os
+
+try:
+    import pvporcupine
+except ImportError:
+    pvporcupine = None
+
+logging.basicConfig(level=logging.INFO)
+engine_logger = logging.getLogger(__name__)
+
+class WakeWordEngine:
+    """Base class for the wake word engines used by WakeWord
+
+    WakeWord reads frame_length samples per chunk and checks a window_length
+    window every hop_length samples. nominate() is cheap and runs inline on
+    every window; verify() confirms a candidate and returns the WakeKeyword or
+    None, on a RecognitionWorker when uses_network is set. keyword_lag, set by
+    nominate(), estimates how many samples before the window end the keyword ended.
+    """
+    name = "base"
+    uses_network = False
+    speech_gated = False  # Skip windows without speech energy before nominate()
+    loop_delay = 0  # Seconds WakeWord sleeps between windows
+    keyword_lag = 0
+
+    def __init__(self, keywords, frame_length, window_length, hop_length):
+        self.keywords = keywords
+        self.frame_length = frame_length
+        self.window_length = window_length
+        self.hop_length = hop_length
+
+    def initialize(self):
+        pass
+
+    def reset(self):
+        """Forget state carried from earlier windows, e.g. before an unrelated stream"""
+        pass
+
+    def nominate(self, window):
+        return True
+
+    def can_detect(self, keyword):
+        """Whether keyword can be detected at all; transcript matching hears every phrase"""
+        return True
+
+    async def verify(self, window, candidate):
+        return candidate if isinstance(candidate, WakeKeyword) else None
+
+    async def detect(self, window):
+        candidate = self.nominate(window)
+        return await self.verify(window, candidate) if candidate else None
+
+    def cleanup(self):
+        pass
+
+class WhisperWakeWordEngine(WakeWordEngine):
+    """Cloud engine: transcribes each window with Whisper and looks for any keyword phrase"""
+    name = "whisper"
+    uses_network = True
+    speech_gated = True
+    loop_delay = 0.1
+
+    def __init__(self, keywords, ai_client, chunk=1024 * 2,
+                 window_seconds=WAKE_WINDOW_SECONDS, hop_seconds=WAKE_HOP_SECONDS):
+        super().__init__(keywords=keywords,
+                         frame_length=chunk,
+                         window_length=int(window_seconds * RATE),
+                         hop_length=int(hop_seconds * RATE))
+        self.ai_client = ai_client
+
+    def nominate(self, window):
+        # The keyword can't be placed in the transcript; assume it ends at the first pause in the window
+        self.keyword_lag = first_pause_lag(window)
+        return True
+
+    async def verify(self, window, candidate):
+        # The window goes straight into an in-memory WAV; the blocking request runs in a thread
+        transcribed_text = await asyncio.to_thread(self.ai_client.speech_to_text, window)
+        return self.keywords.match_transcript(transcribed_text)
+
+class PorcupineWakeWordEngine(WakeWordEngine):
+    """On-device engine: runs Porcupine on every 512-sample frame, no network calls
+
+    One Porcupine instance holds every keyword that has a .ppn file, so each
+    frame is processed once however many keywords are registered. It fires on
+    the frame the keyword ends in, so keyword_lag counts the frames after it.
+    """
+    name = "porcupine"
+
+    def __init__(self, keywords, access_key, model_path=PicoLangModel, sensitivity=None):
+        super().__init__(keywords=keywords, frame_length=512, window_length=512, hop_length=512)
+        self.access_key = access_key
+        self.model_path = model_path
+        self.keyword_paths = keywords.keyword_paths
+        self.sensitivities = ([sensitivity] * len(self.keyword_paths) if sensitivity is not None
+                              else keywords.sensitivities)
+        self.porcupine = None
+
+    def check_available(self):
+        """Raise RuntimeError if Porcupine cannot be started here"""
+        if pvporcupine is None:
+            raise RuntimeError("pvporcupine is not installed")
+        if not self.access_key:
+            raise RuntimeError("PICO_ACCESS_KEY is not set")
+        if not self.keyword_paths:
+            raise RuntimeError("No keyword has a Porcupine keyword file")
+
+    def can_detect(self, keyword):
+        return keyword.keyword_path is not None
+
+    def initialize(self):
+        self.check_available()
+        self.porcupine = pvporcupine.create(
+            access_key=self.access_key,
+            model_path=self.model_path,
+            keyword_paths=self.keyword_paths,
+            sensitivities=self.sensitivities
+        )
+        if self.porcupine.sample_rate != RATE:
+            self.cleanup()
+            raise RuntimeError(f"Porcupine requires {self.porcupine.sample_rate} Hz, recorder runs at {RATE} Hz")
+
+        self.frame_length = self.window_length = self.hop_length = self.porcupine.frame_length
+        engine_logger.info(f"Porcupine initialized with {len(self.keyword_paths)} keyword(s), "
+                           f"frame length {self.frame_length}")
+
+    def reset(self):
+        # Porcupine has no reset call; a fresh instance drops its internal state
+        if self.porcupine is not None:
+            self.cleanup()
+            self.initialize()
+
+    def nominate(self, window):
+        for start in range(0, len(window) - self.frame_length + 1, self.frame_length):
+            keyword_index = self.porcupine.process(window[start:start + self.frame_length])
+            if keyword_index >= 0:
+                self.keyword_lag = len(window) - start - self.frame_length
+                keyword = self.keywords.keyword_for_index(keyword_index)
+                engine_logger.info(f"Porcupine keyword detected: {keyword.name}")
+                return keyword
+        return None
+
+    def cleanup(self):
+        if self.porcupine is not None:
+            try:
+                self.porcupine.delete()
+            except Exception as e:
+                engine_logger.error(f"Error deleting Porcupine instance: {e}")
+            self.porcupine = None
+
+class EnergyOnsetDetector:
+    """Flags frames whose energy rises well above a slowly tracked background level
+
+    An onset lasting max_active_frames is taken to be a lasting rise in the
+    background (TV, fan) rather than speech: it is released and the background
+    restarts from the current level, so later speech is flagged again.
+    """
+    def __init__(self, onset_ratio=4.0, release_ratio=2.0, min_energy=1000.0, adapt_rate=0.05,
+                 max_active_frames=64):
+        self.onset_ratio = onset_ratio
+        self.release_ratio = release_ratio
+        self.min_energy = min_energy
+        self.adapt_rate = adapt_rate
+        self.max_active_frames = max_active_frames
+        self.reset()
+
+    def reset(self):
+        self.background_energy = None
+        self.active = False
+        self.active_frames = 0
+
+    def update(self, pcm):
+        """Return True on the frame where a new onset starts"""
+        samples = pcm.astype(np.float32)
+        energy = float(np.dot(samples, samples)) / max(len(samples), 1)
+
+        if self.background_energy is None:
+            self.background_energy = energy
+            return False
+
+        if self.active:
+            self.active_frames += 1
+            if energy < self.background_energy * self.release_ratio:
+                self.active = False
+            elif self.active_frames >= self.max_active_frames:
+                self.active = False
+                self.background_energy = energy
+            return False
+
+        if energy > self.background_energy * self.onset_ratio and energy > self.min_energy:
+            self.active = True
+            self.active_frames = 0
+            return True
+
+        self.background_energy += self.adapt_rate * (energy - self.background_energy)
+        return False
+
+class CascadeWakeWordEngine(WakeWordEngine):
+    """Two-stage engine: a local detector nominates candidate windows, Whisper confirms them
+
+    Stage one runs on every 512-sample frame: an energy onset detector plus an
+    optional Porcupine keyword spotter. Only when it nominates a candidate is
+    the whole window (the last WAKE_WINDOW_SECONDS) sent to the Whisper verifier.
+    The keyword is taken to end at the spotter frame, or without a spotter
+    where the onset's energy was released (else at the window end).
+    """
+    name = "cascade"
+    uses_network = True
+
+    def __init__(self, keywords, verifier, spotter=None, frame_length=512, window_seconds=WAKE_WINDOW_SECONDS,
+                 spotter_post_roll=0.25, onset_post_roll=1.5):
+        super().__init__(keywords=keywords,
+                         frame_length=frame_length,
+                         window_length=int(window_seconds * RATE),
+                         hop_length=frame_length)
+        self.verifier = verifier
+        self.spotter = spotter
+        self.onset = EnergyOnsetDetector()
+
+        self.spotter_post_roll = spotter_post_roll
+        self.onset_post_roll = onset_post_roll
+        self.frames_since_onset = None
+        self.frames_since_release = None
+        self.pending_frames = None
+
+        self.candidate_count = 0
+        self.confirmed_count = 0
+
+    def initialize(self):
+        if self.spotter is not None:
+            self.frame_length = self.hop_length = self.spotter.frame_length
+
+        frames_per_second = RATE / self.frame_length
+        self.frames_per_window = int(self.window_length / self.frame_length)
+        # An onset longer than a window is background, not a keyword
+        self.onset.max_active_frames = self.frames_per_window
+        self.spotter_post_frames = max(1, int(self.spotter_post_roll * frames_per_second))
+        self.onset_post_frames = max(1, int(self.onset_post_roll * frames_per_second))
+
+    def reset(self):
+        self.onset.reset()
+        self.frames_since_onset = None
+        self.frames_since_release = None
+        self.pending_frames = None
+        if self.spotter is not None:
+            self.spotter.reset()
+
+    def nominate(self, window):
+        frame = window[-self.frame_length:]
+
+        was_active = self.onset.active
+        if self.onset.update(frame):
+            self.frames_since_onset = 0
+            self.frames_since_release = None
+        elif self.frames_since_onset is not None:
+            self.frames_since_onset += 1
+            if self.frames_since_onset > self.frames_per_window:
+                self.frames_since_onset = None
+        if was_active and not self.onset.active:
+            self.frames_since_release = 0
+        elif self.frames_since_release is not None:
+            self.frames_since_release += 1
+
+        # Porcupine keeps internal state, so it sees every frame
+        spotted = self.spotter is not None and self.spotter.nominate(frame)
+
+        if self.pending_frames is not None:
+            self.pending_frames -= 1
+            if self.pending_frames <= 0:
+                self.pending_frames = None
+                self.candidate_count += 1
+                if self.spotter is not None:
+                    self.keyword_lag = self.spotter_post_frames * self.frame_length
+                else:
+                    self.keyword_lag = (self.frames_since_release or 0) * self.frame_length
+                return True
+            return False
+
+        if self.spotter is not None:
+            if spotted and self.frames_since_onset is not None:
+                self.pending_frames = self.spotter_post_frames
+        elif self.frames_since_onset == 0:
+            self.pending_frames = self.onset_post_frames
+        return False
+
+    def can_detect(self, keyword):
+        # With a spotter only its keywords become candidates
+        return self.spotter is None or self.spotter.can_detect(keyword)
+
+    async def verify(self, window, candidate):
+        confirmed = await self.verifier.verify(window, candidate)
+        if confirmed:
+            self.confirmed_count += 1
+        engine_logger.info(f"Cascade candidate {'confirmed' if confirmed else 'rejected'} "
+                           f"({self.confirmed_count}/{self.candidate_count} confirmed)")
+        return confirmed
+
+    def cleanup(self):
+        if self.spotter is not None:
+            self.spotter.cleanup()
+        self.verifier.cleanup()
+
+def first_pause_lag(window, frame_length=512, pause_seconds=0.2, level_db=-20.0):
+    """Samples from the first pause after speech to the end of window, 0 without one
+
+    Frames within level_db of the loudest frame count as speech; a pause is
+    pause_seconds of frames below that.
+    """
+    n_frames = len(window) // frame_length
+    if n_frames == 0:
+        return 0
+    frames = np.asarray(window[len(window) - n_frames * frame_length:], dtype=np.float32).reshape(n_frames, -1)
+    energy = np.einsum('ij,ij->i', frames, frames)
+    loud = energy >= energy.max() * 10 ** (level_db / 10)
+    pause_frames = max(1, int(pause_seconds * RATE / frame_length))
+    speech = np.flatnonzero(loud)
+    for start in range(speech[0] + 1, n_frames - pause_frames + 1):
+        if not loud[start:start + pause_frames].any():
+            return (n_frames - start) * frame_length
+    return 0
+
+def create_wake_word_engine(name, ai_client, keywords, access_key=None, local_stages=True):
+    """Create the requested engine, falling back to Whisper if a local engine can't start
+
+    Without local_stages the engine only verifies candidates nominated
+    elsewhere (the wake word process): no Porcupine instance is created, only
+    checked for availability so the fallback matches the process's engine.
+    """
+    access_key = access_key or os.environ.get("PICO_ACCESS_KEY")
+
+    if name == "cascade":
+        verifier = WhisperWakeWordEngine(keywords=keywords, ai_client=ai_client)
+        spotter = None
+        try:
+            # High sensitivity: the spotter only nominates, Whisper has the final say
+            spotter = PorcupineWakeWordEngine(keywords=keywords, access_key=access_key, sensitivity=0.9)
+            if local_stages:
+                spotter.initialize()
+            else:
+                spotter.check_available()
+        except Exception as e:
+            engine_logger.warning(f"Keyword spotter unavailable, cascade will use energy onset only: {e}")
+            spotter = None
+        engine = CascadeWakeWordEngine(keywords=keywords, verifier=verifier, spotter=spotter)
+        engine.initialize()
+        return engine
+
+    if name == "porcupine":
+        try:
+            engine = PorcupineWakeWordEngine(keywords=keywords, access_key=access_key)
+            if local_stages:
+                engine.initialize()
+            else:
+                engine.check_available()
+            return engine
+        except Exception as e:
+            engine_logger.error(f"Failed to initialize Porcupine engine, falling back to Whisper: {e}")
+    elif name != "whisper":
+        engine_logger.warning(f"Unknown wake word engine '{name}', using Whisper")
+
+    engine = WhisperWakeWordEngine(keywords=keywords, ai_client=ai_client)
+    engine.initialize()
+    return engine
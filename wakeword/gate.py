@@ -0,0 +1,65 @@
+from audio.vad import create_vad
+from collections import deque
+from utils import metrics
+
+import math
+
+class SpeechGate:
+    """Skips wake word windows that contain no speech-band energy
+
+    update() sees every captured chunk once: it is split into PyRecorder-sized
+    pieces (a remainder is carried into the next call) and run through this
+    stream's own VAD backend (the kind PyRecorder is configured with); with
+    track_noise_floor each piece's energy also feeds PyRecorder's noise floor. allows() is called once per hop; a window passes
+    if any hop it covers had speech. Until PyRecorder has an energy_threshold
+    every window passes.
+    """
+    def __init__(self, py_recorder, window_length, hop_length, track_noise_floor=True):
+        self.py_recorder = py_recorder
+        self.hop_length = hop_length
+        self.track_noise_floor = track_noise_floor
+        self.vad = create_vad(py_recorder.vad_name, py_recorder) if py_recorder is not None else None
+        self.hop_flags = deque(maxlen=max(1, math.ceil(window_length / hop_length)))
+        self._hop_speech = False
+        self._pending = b''
+
+    def update(self, data):
+        """Analyse one captured chunk (bytes)"""
+        if self.py_recorder is None:
+            return
+        piece_bytes = self.py_recorder.CHUNK_SIZE * 2
+        if self._pending:
+            data = self._pending + bytes(data)
+        # Short tails would bias the noise floor low, so only whole pieces are analysed
+        whole = len(data) - len(data) % piece_bytes
+        self._pending = bytes(data[whole:])
+        for start in range(0, whole, piece_bytes):
+            piece = data[start:start + piece_bytes]
+            speaking, energy = self.vad.process(piece)
+            if self.track_noise_floor:
+                self.py_recorder.update_noise_floor(piece, energy)
+            if speaking:
+                self._hop_speech = True
+
+    def allows(self, window=None):
+        """Return True if the current window should go on to the wake word engine"""
+        metrics.increment('wakeword.windows')
+        hop_speech, self._hop_speech = self._hop_speech, False
+
+        if self.py_recorder is None or self.py_recorder.energy_threshold is None:
+            metrics.increment('wakeword.windows_ungated')
+            return True
+
+        self.hop_flags.append(hop_speech)
+        if any(self.hop_flags):
+            return True
+
+        metrics.increment('wakeword.windows_skipped_silence')
+        return False
+
+    def reset(self):
+        self.hop_flags.clear()
+        self._hop_speech = False
+        self._pending = b''
+        if self.vad:
+            self.vad.reset()
@@ -0,0 +1,72 @@
+from utils.define import *
+
+import re
+
+class WakeKeyword:
+    """A wake keyword and the action it triggers
+
+    phrases are matched against Whisper transcripts; keyword_path is the
+    Porcupine .ppn file, if one exists for this keyword.
+    """
+    def __init__(self, name, phrases, action, keyword_path=None, sensitivity=0.7):
+        self.name = name
+        self.phrases = phrases
+        self.action = action
+        self.keyword_path = keyword_path
+        self.sensitivity = sensitivity
+
+    def __repr__(self):
+        return f"WakeKeyword({self.name}, {self.action.name})"
+
+class KeywordRegistry:
+    """All wake keywords, evaluated together in one engine pass
+
+    Porcupine gets every .ppn in a single instance and reports an index;
+    transcripts are checked with one combined regular expression.
+    """
+    def __init__(self, keywords):
+        self.keywords = list(keywords)
+        self.spotted_keywords = [keyword for keyword in self.keywords if keyword.keyword_path]
+
+        self._phrase_owner = {}
+        for keyword in self.keywords:
+            for phrase in keyword.phrases:
+                self._phrase_owner[phrase.lower()] = keyword
+        # Longest phrases first so a phrase wins over a shorter one it contains
+        phrases = sorted(self._phrase_owner, key=len, reverse=True)
+        self._pattern = re.compile("|".join(re.escape(phrase) for phrase in phrases)) if phrases else None
+
+    @property
+    def keyword_paths(self):
+        return [keyword.keyword_path for keyword in self.spotted_keywords]
+
+    @property
+    def sensitivities(self):
+        return [keyword.sensitivity for keyword in self.spotted_keywords]
+
+    def get(self, name):
+        """Look a keyword up by name, None if unknown"""
+        for keyword in self.keywords:
+            if keyword.name == name:
+                return keyword
+        return None
+
+    def keyword_for_index(self, index):
+        """Map a Porcupine keyword index back to its keyword"""
+        return self.spotted_keywords[index]
+
+    def match_transcript(self, text):
+        """Return the first keyword whose phrase appears in the transcript, or None"""
+        if self._pattern is None:
+            return None
+        match = self._pattern.search(text.strip().lower())
+        return self._phrase_owner[match.group(0)] if match else None
+
+DEFAULT_KEYWORDS = [
+    WakeKeyword("konnichiwa", ["こんにちは"], WakeWordType.TRIGGER, keyword_path=PicoWakeWordKonnichiwa),
+    WakeKeyword("satoru", ["さとる", "サトル"], WakeWordType.TRIGGER, keyword_path=PicoWakeWordSatoru),
+    # Transcript-only keywords until matching .ppn files are trained
+    WakeKeyword("settings", ["設定を開いて"], WakeWordType.SETTINGS),
+    WakeKeyword("stop", ["止めて", "ストップ"], WakeWordType.STOP_PLAYBACK),
+    WakeKeyword("medication", ["お薬の時間", "薬の確認"], WakeWordType.SCHEDULE),
+]
@@ -0,0 +1,317 @@
+from audio.capture import MicrophoneBus, open_input_stream, suppress_stdout_stderr
+from audio.ringbuffer import SharedAudioRingBuffer
+from collections import deque
+from multiprocessing import shared_memory
+from utils import metrics
+from utils.define import RATE
+from wakeword.gate import SpeechGate
+from wakeword.worker import RecognitionWorker
+
+import asyncio
+import logging
+import multiprocessing
+
+logging.basicConfig(level=logging.INFO)
+process_logger = logging.getLogger(__name__)
+
+def _wake_process_main(shm_name, capacity, conn, stop_event, pause_event, engine_name, chunk_size, vad,
+                       device_index=None, native_rate=False):
+    """Child process: capture into the shared ring and run the local wake word stages
+
+    Runs with its own interpreter (and GIL). Every chunk is announced with an
+    ("audio", total_written) message; detections, candidates for network
+    verification and the current noise floor follow over the same pipe.
+    While pause_event is set only capture and calibration keep running.
+    """
+    # Imported here so the parent never loads the engine stack twice for nothing
+    from audio.recorder import PyRecorder
+    from wakeword.detector import WakeWordDetector
+    from wakeword.engine import create_wake_word_engine
+    from wakeword.keywords import DEFAULT_KEYWORDS, KeywordRegistry
+    import numpy as np
+    import pyaudio
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    ring = SharedAudioRingBuffer(capacity, shm.buf)
+    pyaudio_instance = None
+    stream = None
+    engine = None
+    try:
+        # Network verification happens in the parent, so the engine gets no AI client here
+        engine = create_wake_word_engine(name=engine_name, ai_client=None,
+                                         keywords=KeywordRegistry(DEFAULT_KEYWORDS))
+        py_recorder = PyRecorder(microphone=None, vad=vad)
+        detector = WakeWordDetector(engine, check=None, py_recorder=py_recorder)
+        # The threshold moves every chunk; the parent only needs it about once a second
+        samples_since_threshold = RATE
+        paused = False
+
+        with suppress_stdout_stderr():
+            pyaudio_instance = pyaudio.PyAudio()
+            stream, resampler = open_input_stream(pyaudio_instance, chunk_size, device_index=device_index,
+                                                  native_rate=native_rate)
+        read_size = chunk_size if resampler is None else round(chunk_size * resampler.in_rate / RATE)
+
+        while not stop_event.is_set():
+            data = stream.read(read_size, exception_on_overflow=False)
+            if resampler is not None:
+                data = resampler.process(np.frombuffer(data, dtype=np.int16)).tobytes()
+            ring.write(data)
+            end_index = ring.total_written
+            conn.send(("audio", end_index))
+
+            if pause_event.is_set():
+                # Keep the noise floor current for calibration, skip the engine
+                paused = True
+                detector.speech_gate.update(data)
+            else:
+                if paused:
+                    # Whatever the engine held from before the pause is stale
+                    paused = False
+                    detector.reset()
+                if detector.push(data):
+                    candidate = detector.nominate()
+                    keyword_end = end_index - engine.keyword_lag
+                    if candidate and engine.uses_network:
+                        conn.send(("candidate", end_index, getattr(candidate, 'name', None), keyword_end))
+                    elif candidate:
+                        conn.send(("detected", end_index, candidate.name, keyword_end))
+                        detector.reset()
+
+            samples_since_threshold += len(data) // 2
+            if samples_since_threshold >= RATE and py_recorder.energy_threshold is not None:
+                samples_since_threshold = 0
+                conn.send(("calibration", py_recorder.silence_energy, py_recorder.energy_threshold))
+
+    except (BrokenPipeError, EOFError):
+        pass  # Parent went away
+    except Exception as e:
+        try:
+            conn.send(("error", str(e)))
+        except Exception:
+            pass
+    finally:
+        if stream is not None:
+            try:
+                stream.stop_stream()
+                stream.close()
+            except Exception:
+                pass
+        if pyaudio_instance is not None:
+            pyaudio_instance.terminate()
+        if engine is not None:
+            engine.cleanup()
+        ring.release()
+        shm.close()
+        conn.close()
+
+class ProcessMicrophoneBus(MicrophoneBus):
+    """MicrophoneBus whose capture and wake word front end run in a separate process
+
+    The child writes PCM into a multiprocessing.shared_memory ring buffer that
+    this bus exposes as its ring, so subscriptions (PyRecorder included) read it
+    exactly like the in-process bus. Display rendering, DSP and JSON handling in
+    this process can no longer delay audio reads. Detection events arrive over a
+    pipe watched by the event loop and are queued in events.
+    """
+    def __init__(self, engine_name, vad='energy', chunk_size=256, ring_seconds=5, device_index=None,
+                 native_rate=False):
+        super().__init__(chunk_size=chunk_size, ring_seconds=ring_seconds, device_index=device_index,
+                         native_rate=native_rate)
+        self.engine_name = engine_name
+        self.vad = vad
+        self.capacity = ring_seconds * RATE
+        self.events = deque(maxlen=32)
+        self.calibration = None  # (silence_energy, energy_threshold) from the child
+        self.shm = None
+        self.process = None
+        self.conn = None
+        self.stop_event = None
+        self.pause_event = None
+
+    def open(self):
+        if self.is_open():
+            return self
+        # A child that exited leaves its process, pipe and shared memory behind
+        self._release()
+        try:
+            self.loop = asyncio.get_running_loop()
+            context = multiprocessing.get_context('spawn')
+
+            self.shm = shared_memory.SharedMemory(create=True, size=SharedAudioRingBuffer.size_for(self.capacity))
+            self.ring = SharedAudioRingBuffer(self.capacity, self.shm.buf, create=True)
+            self.conn, child_conn = context.Pipe(duplex=False)
+            self.stop_event = context.Event()
+            self.pause_event = context.Event()
+
+            self.process = context.Process(
+                target=_wake_process_main,
+                args=(self.shm.name, self.capacity, child_conn, self.stop_event, self.pause_event,
+                      self.engine_name, self.chunk_size, self.vad, self.device_index, self.native_rate),
+                name="wakeword-capture",
+                daemon=True
+            )
+            self.process.start()
+            child_conn.close()
+
+            self.loop.add_reader(self.conn.fileno(), self._on_message)
+            process_logger.info(f"Wake word capture process started (pid {self.process.pid})")
+            return self
+        except Exception as e:
+            process_logger.error(f"Failed to start wake word capture process: {e}")
+            self.close()
+            raise
+
+    def pause_engine(self, paused):
+        """Stop (or resume) running the wake word engine in the child; capture continues"""
+        if self.pause_event is None:
+            return
+        if paused:
+            self.pause_event.set()
+        else:
+            self.pause_event.clear()
+
+    def is_open(self):
+        return self.process is not None and self.process.is_alive()
+
+    def _on_message(self):
+        try:
+            while self.conn.poll():
+                message = self.conn.recv()
+                kind = message[0]
+                if kind == "audio":
+                    for subscription in self.subscribers:
+                        subscription._notify()
+                elif kind in ("candidate", "detected"):
+                    self.events.append(message)
+                elif kind == "calibration":
+                    self.calibration = message[1:]
+                elif kind == "error":
+                    process_logger.error(f"Wake word capture process failed: {message[1]}")
+        except (EOFError, OSError):
+            # Child exited; closing the subscriptions surfaces it as an IOError to readers
+            process_logger.error("Wake word capture process exited")
+            metrics.increment('capture.process_exits')
+            self._stop_reading()
+            for subscription in list(self.subscribers):
+                subscription.close()
+
+    def _stop_reading(self):
+        if self.loop is not None and self.conn is not None:
+            try:
+                self.loop.remove_reader(self.conn.fileno())
+            except Exception:
+                pass
+
+    def close(self):
+        for subscription in list(self.subscribers):
+            subscription.close()
+        self._release()
+
+    def _release(self):
+        """Stop the child if it still runs and free its pipe and shared memory"""
+        self._stop_reading()
+
+        if self.process is not None:
+            self.stop_event.set()
+            if self.process.pid is not None:  # Joining also reaps a child that already exited
+                self.process.join(timeout=2.0)
+                if self.process.is_alive():
+                    process_logger.warning("Wake word capture process did not stop, terminating")
+                    self.process.terminate()
+                    self.process.join(timeout=1.0)
+            self.process = None
+            self.stop_event = self.pause_event = None
+
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+        if self.shm is not None:
+            self.ring.release()
+            try:
+                self.shm.close()
+                self.shm.unlink()
+            except Exception as e:
+                process_logger.error(f"Error releasing shared memory: {e}")
+            self.shm = None
+
+class ProcessWakeWordDetector:
+    """Parent-side counterpart of WakeWordDetector for a ProcessMicrophoneBus
+
+    Windowing, gating and nominate() already ran in the child; this consumes
+    its events. Local detections are returned as they are, network candidates
+    are cut out of the shared ring and verified on a RecognitionWorker.
+    Events from before this detector started (e.g. during a conversation) are
+    ignored.
+    """
+    def __init__(self, engine, check, bus, py_recorder=None):
+        self.engine = engine
+        self.bus = bus
+        self.py_recorder = py_recorder
+        # Wake word gating runs in the child; this one only serves the presence idle path
+        self.speech_gate = None
+        if py_recorder is not None:
+            self.speech_gate = SpeechGate(py_recorder, engine.window_length, engine.hop_length,
+                                          track_noise_floor=False)
+        self.worker = RecognitionWorker(check) if engine.uses_network else None
+        self.start_index = bus.position
+        self._since_hop = 0
+        self.detected_index = None
+        self.keyword_end_index = None
+
+    def start(self):
+        if self.worker:
+            self.worker.start()
+
+    async def stop(self):
+        if self.worker:
+            await self.worker.stop()
+
+    def reset(self):
+        self.start_index = self.bus.position
+        self.bus.events.clear()
+        self._since_hop = 0
+        if self.worker:
+            self.worker.reset()
+        self.detected_index = None
+        self.keyword_end_index = None
+
+    def push(self, data, idle=False):
+        """Count one captured chunk, return True when the next hop is due; the gate only runs while idle"""
+        self._apply_calibration()
+        if idle and self.speech_gate:
+            self.speech_gate.update(data)
+        self._since_hop += len(data) // 2
+        if self._since_hop >= self.engine.hop_length:
+            self._since_hop %= self.engine.hop_length
+            return True
+        return False
+
+    def window(self):
+        return self.bus.ring.latest(self.engine.window_length)
+
+    def _apply_calibration(self):
+        if self.py_recorder is not None and self.bus.calibration is not None:
+            self.py_recorder.silence_energy, self.py_recorder.energy_threshold = self.bus.calibration
+
+    async def detect(self, end_index):
+        while self.bus.events:
+            kind, event_index, name, keyword_end = self.bus.events.popleft()
+            if event_index < self.start_index:
+                continue
+            keyword = self.engine.keywords.get(name) if name else None
+
+            if kind == "detected" and keyword:
+                self.detected_index = event_index
+                self.keyword_end_index = keyword_end
+                return keyword
+            if kind == "candidate" and self.worker:
+                window = self.bus.ring.read_at(event_index - self.engine.window_length, self.engine.window_length)
+                self.worker.submit(window, end_index=event_index, candidate=keyword or True, keyword_end=keyword_end)
+
+        if self.worker:
+            self.detected_index = self.worker.detected_index
+            self.keyword_end_index = self.worker.keyword_end_index
+            return self.worker.detected_keyword
+        return None
@@ -1,68 +1,79 @@
 from display.setting import SettingMenu
+from sensor.presence import PresenceMonitor
+from utils import metrics
 from utils.define import *
 from utils.scheduler import run_pending
 from utils.utils import is_exit_event_set
+from wakeword.engine import create_wake_word_engine
+from wakeword.keywords import DEFAULT_KEYWORDS, KeywordRegistry
+from wakeword.process import ProcessMicrophoneBus, ProcessWakeWordDetector
+from wakeword.detector import WakeWordDetector
 
 import asyncio
 import logging
-import pyaudio
 import time
 
 logging.basicConfig(level=logging.INFO)
 wakeword_logger = logging.getLogger(__name__)
 
 class WakeWord:
-    def __init__(self, args, audio_player, display_manager):
+    def __init__(self, args, audio_player, display_manager, microphone):
         self.audio_player = audio_player
-        self.pyaudio_instance = None
+        self.microphone = microphone
         self.audio_stream = None
         self.play_trigger = None
         self.server = args.server
         self.ai_client = args.aiclient
         self._cleanup_lock = asyncio.Lock()
-        
-        # Audio settings
-        self.CHANNELS = 1
-        self.RATE = 16000
-        self.FORMAT = pyaudio.paInt16
-        self.CHUNK = 1024 * 2  # 2048 samples = ~128ms at 16kHz
-        self.RECORD_SECONDS = 2  # Process 2 seconds of audio at a time
-        
-        # self.WAKE_WORDS = ["こんにちは", "聞いて", "お願い"]
-        self.WAKE_WORD = "こんにちは"
+
+        # Every keyword is checked in the same engine pass; each maps to its own action
+        self.keywords = KeywordRegistry(DEFAULT_KEYWORDS)
+
+        # Without the acknowledgement sound the question is recorded straight from the wake word end
+        self.acknowledge_wake_word = not getattr(args, 'no_wake_ack', False)
+        self.question_start_index = None  # Microphone bus index the next question starts from
+        self.ptt_pressed_at = None  # monotonic time the push-to-talk press was seen
+
+        # Wake word engine (porcupine runs on-device, whisper is the cloud fallback)
+        self.engine = create_wake_word_engine(
+            name=getattr(args, 'wake_engine', 'porcupine'),
+            ai_client=self.ai_client,
+            keywords=self.keywords,
+            # With a wake word process the local stages run there; this side only verifies candidates
+            local_stages=not isinstance(microphone, ProcessMicrophoneBus)
+        )
+        # Chunk size of this side's bus subscriptions
+        self.CHUNK = self.engine.frame_length
+        wakeword_logger.info(f"Using {self.engine.name} wake word engine")
 
         self.setting_menu = SettingMenu(audio_player=self.audio_player, display_manager=display_manager)
 
-        self.initialize_pyaudio()
+        # Without motion for a while, only the local energy gate runs until someone is back
+        self.presence = PresenceMonitor(
+            server=self.server,
+            display_manager=display_manager,
+            idle_minutes=getattr(args, 'presence_idle_minutes', PRESENCE_IDLE_MINUTES),
+            poll_interval=getattr(args, 'presence_poll_seconds', PRESENCE_POLL_SECONDS),
+            idle_brightness=PRESENCE_IDLE_BRIGHTNESS
+        )
 
-    def initialize_pyaudio(self):
+        self.initialize_recorder()
+
+    def initialize_recorder(self):
+        """Subscribe to the shared microphone bus (the device itself stays open)"""
         try:
-            if self.pyaudio_instance is None:
-                self.pyaudio_instance = pyaudio.PyAudio()
-            
             if self.audio_stream is None:
-                self.audio_stream = self.pyaudio_instance.open(
-                    format=self.FORMAT,
-                    channels=self.CHANNELS,
-                    rate=self.RATE,
-                    input=True,
-                    frames_per_buffer=self.CHUNK
-                )
-                wakeword_logger.info("PyAudio recorder initialized successfully")
+                self.audio_stream = self.microphone.subscribe(self.CHUNK)
+                wakeword_logger.info("Wake word microphone subscription started")
         except Exception as e:
-            wakeword_logger.error(f"Failed to initialize PyAudio recorder: {e}")
-            if self.pyaudio_instance:
-                try:
-                    self.pyaudio_instance.terminate()
-                except:
-                    pass
-                self.pyaudio_instance = None
+            wakeword_logger.error(f"Failed to subscribe to microphone: {e}")
+            self.audio_stream = None
 
     async def _play_audio_with_retry(self, audio_file):
         try:
             wakeword_logger.info("Playing response audio...")
             if self.audio_stream and self.audio_stream.is_active():
-                self.audio_stream.stop_stream()
+                self.audio_stream.pause()
             
             await self.audio_player.play_audio(audio_file)
             return True
@@ -70,71 +81,36 @@ class WakeWord:
             wakeword_logger.error(f"Audio playback error: {e}")
             return False
     
-    async def check_for_wake_word(self, audio_frames):
+    async def check_for_wake_word(self, window, candidate=True):
         try:
-            temp_file = "/tmp/wake_check.wav"
-            self.save_audio(audio_frames, temp_file)
-            
-            transcribed_text = self.ai_client.speech_to_text(temp_file).strip().lower()
-
-            # for wake_word in self.WAKE_WORDS:
-            if self.WAKE_WORD in transcribed_text:
-                wakeword_logger.info("Wake word detected")
-                return True 
-            return False
+            keyword = await self.engine.verify(window, candidate)
+            if keyword:
+                wakeword_logger.info(f"Wake word detected: {keyword.name} ({keyword.action.name})")
+            return keyword
             
         except KeyboardInterrupt:
             wakeword_logger.info("KeyboardInterrupt received in check_for_wake_word")
             raise
         except Exception as e:
             wakeword_logger.error(f"Error checking for wake word: {e}")
-            return False
-        finally:
-            try:
-                os.remove(temp_file)
-            except:
-                pass
+            return None
 
-    def save_audio(self, frames, filename):
-        """Save audio frames to WAV file"""
-        try:
-            wf = wave.open(filename, 'wb')
-            wf.setnchannels(self.CHANNELS)
-            wf.setsampwidth(self.pyaudio_instance.get_sample_size(self.FORMAT))
-            wf.setframerate(self.RATE)
-            wf.writeframes(b''.join(frames))
-            wf.close()
-        except Exception as e:
-            wakeword_logger.error(f"Error saving audio: {e}")
-            raise
-    
-    def initialize_recorder(self):
-        if self.audio_stream is None:
-            try:
-                if self.pyaudio_instance is None:
-                    self.pyaudio_instance = pyaudio.PyAudio()
-                
-                self.audio_stream = self.pyaudio_instance.open(
-                    format=self.FORMAT,
-                    channels=self.CHANNELS,
-                    rate=self.RATE,
-                    input=True,
-                    frames_per_buffer=self.CHUNK
-                )
-                wakeword_logger.info("PyAudio recorder initialized successfully")
-            except Exception as e:
-                wakeword_logger.error(f"Failed to initialize PyAudio recorder: {e}")
-                raise
+    async def open_setting_menu(self):
+        response = await self.setting_menu.display_menu()
+        await asyncio.sleep(0.1)
+        return response
     
     async def check_buttons(self):
         try:
             active_buttons = await self.server.get_buttons()
+            if active_buttons[0]:  # CENTER button: push-to-talk
+                wakeword_logger.info("Center Button Pressed")
+                return 'push_to_talk'
             if active_buttons[4]:  # RIGHT button
                 wakeword_logger.info("Right Button Pressed")
                 # sensors = await self.server.get_sensors()
                 # wakeword_logger.error(f"Sensors Result: {sensors}")
-                response = await self.setting_menu.display_menu()
-                await asyncio.sleep(0.1)
+                response = await self.open_setting_menu()
                 if response:
                     return response
             return None
@@ -142,29 +118,14 @@ class WakeWord:
             wakeword_logger.error(f"Error in check_buttons: {e}")
             return None
         
-    async def calibrate_audio(self, py_recorder, frame_bytes):
-        try:
-            if is_exit_event_set():
-                raise KeyboardInterrupt
-                
-            py_recorder.calibrate_energy_threshold(frame_bytes)
-            return []
-        except KeyboardInterrupt:
-            wakeword_logger.info("Calibration interrupted")
-            raise
-        except Exception as e:
-            wakeword_logger.error(f"Error in calibration: {e}")
-            return frame_bytes
-        
-    async def _cleanup_porcupine(self):
-        """Separate method for Porcupine cleanup to handle timeouts"""
-        if self.porcupine:
+    async def cleanup_engine(self):
+        """Separate method for wake word engine cleanup to handle timeouts"""
+        if self.engine:
             try:
-                # Create a process to handle Porcupine cleanup
+                # Create a process to handle engine cleanup
                 def cleanup_in_process():
                     try:
-                        if hasattr(self.porcupine, 'cleanup'):
-                            self.porcupine.cleanup()
+                        self.engine.cleanup()
                         return True
                     except Exception:
                         return False
@@ -175,37 +136,81 @@ class WakeWord:
                     loop.run_in_executor(None, cleanup_in_process),
                     timeout=1.0
                 )
-                wakeword_logger.info("Porcupine cleanup completed")
+                wakeword_logger.info("Wake word engine cleanup completed")
             except asyncio.TimeoutError:
-                wakeword_logger.error("Porcupine cleanup timed out - forcing cleanup")
-                self.porcupine = None  # Force cleanup by dropping reference
+                wakeword_logger.error("Wake word engine cleanup timed out - forcing cleanup")
+                self.engine = None  # Force cleanup by dropping reference
             except Exception as e:
-                wakeword_logger.error(f"Error in Porcupine cleanup: {e}")
-                self.porcupine = None  # Force cleanup by dropping reference
+                wakeword_logger.error(f"Error in wake word engine cleanup: {e}")
+                self.engine = None  # Force cleanup by dropping reference
             finally:
-                self.porcupine = None
+                self.engine = None
+
+    def _create_detector(self, py_recorder, track_noise_floor=True):
+        if isinstance(self.microphone, ProcessMicrophoneBus):
+            # Capture and the local stages run in the child process, only events come back here
+            return ProcessWakeWordDetector(self.engine, self.check_for_wake_word,
+                                           bus=self.microphone, py_recorder=py_recorder)
+        return WakeWordDetector(self.engine, self.check_for_wake_word, py_recorder=py_recorder,
+                                track_noise_floor=track_noise_floor)
+
+    def can_stop_playback(self):
+        """Whether the engine can detect any STOP_PLAYBACK keyword, i.e. listen_for_stop is worth running"""
+        return self.engine is not None and any(
+            keyword.action == WakeWordType.STOP_PLAYBACK and self.engine.can_detect(keyword)
+            for keyword in self.engine.keywords.keywords)
+
+    async def listen_for_stop(self, py_recorder):
+        """Stop response playback when a STOP_PLAYBACK keyword is heard; runs until cancelled
+
+        Uses its own bus subscription and only checks windows while something
+        is playing. There is no echo cancellation, so the reply itself is in
+        the audio; the stop phrases should not occur in replies.
+        """
+        stream = self.microphone.subscribe(self.CHUNK)
+        # The reply is in the audio, so this gate must not move the noise floor
+        detector = self._create_detector(py_recorder, track_noise_floor=False)
+        detector.start()
+        try:
+            while not is_exit_event_set():
+                if not detector.push(await stream.read()) or not self.audio_player.playback_active:
+                    continue
+                keyword = await detector.detect(end_index=stream.position)
+                if keyword and keyword.action == WakeWordType.STOP_PLAYBACK:
+                    wakeword_logger.info(f"Stop keyword detected during playback: {keyword.name}")
+                    metrics.increment('playback.stopped')
+                    self.audio_player.stop_playback()
+                if keyword:
+                    detector.reset()
+                await asyncio.sleep(self.engine.loop_delay)
+        finally:
+            await detector.stop()
+            stream.close()
 
     async def listen_for_wake_word(self, schedule_manager, py_recorder):
         tasks = set()
+        detector = None
         try:
+            self.question_start_index = None
+            self.ptt_pressed_at = None
             if self.audio_stream is None:
-                self.initialize_pyaudio()
+                self.initialize_recorder()
                 if self.audio_stream is None:
                     wakeword_logger.error("Failed to initialize audio stream")
                     return False, WakeWordType.OTHER
 
-            frames = []
-            frame_bytes = []
-            calibration_interval = 5
-            last_button_check_time = time.time()
-            last_calibration_time = time.time()
-            button_check_interval = 1.5
-            chunks_per_check = int(self.RECORD_SECONDS * self.RATE / self.CHUNK)
+            last_button_check_time = time.monotonic()
+            last_button_check_index = self.microphone.position
+            button_check_interval = BUTTON_POLL_SECONDS
+            detector = self._create_detector(py_recorder)
+            detector.start()
+            idle_gate = detector.speech_gate
+            was_idle = False
             
             if self.play_trigger is None:
                 try:
                     if self.audio_stream:
-                        self.audio_stream.stop_stream()
+                        self.audio_stream.pause()
                     await asyncio.sleep(0.1)  
 
                     trigger_task = asyncio.create_task(
@@ -217,7 +222,7 @@ class WakeWord:
                     await asyncio.sleep(0.1)  
 
                     if self.audio_stream:
-                        self.audio_stream.start_stream()
+                        self.audio_stream.resume()
                 except Exception as e:
                     wakeword_logger.error(f"Error playing trigger sound: {e}")
 
@@ -228,44 +233,38 @@ class WakeWord:
                     if schedule_manager and schedule_manager.check_scheduled_conversation():
                         return True, WakeWordType.SCHEDULE
                     
-                    frames = []
-                    # Record audio chunks
-                    for _ in range(chunks_per_check):
+                    # Record audio chunks until the next overlapping window or button poll is due
+                    window_ready = button_due = False
+                    while not (window_ready or button_due):
                         if is_exit_event_set():
                             raise KeyboardInterrupt
-                        data = self.audio_stream.read(self.CHUNK, exception_on_overflow=False)
-                        frames.append(data)
-                        frame_bytes.append(data)
-
-                    # Calibrate periodically
-                    current_time = time.time()
-                    
-                    if current_time - last_calibration_time >= calibration_interval:
-                        try:
-                            if self.audio_stream:
-                                self.audio_stream.stop_stream()
-                            
-                            frame_bytes = await self.calibrate_audio(py_recorder, frame_bytes)
-                            last_calibration_time = current_time
+                        data = await self.audio_stream.read()
+                        # Calibration happens inside push(); capture keeps running on the bus
+                        window_ready = detector.push(data, idle=self.presence.idle)
+                        button_due = time.monotonic() - last_button_check_time >= button_check_interval
 
-                            if self.audio_stream:
-                                self.audio_stream.start_stream()
-                        except KeyboardInterrupt:
-                            raise 
-                        except Exception as e:
-                            wakeword_logger.error(f"Error in calibration: {e}")
+                    current_time = time.monotonic()
+                    current_index = self.microphone.position
                     
-                    # Check buttons periodically
-                    if current_time - last_button_check_time >= button_check_interval:
+                    # Check buttons between chunks, not only once a window is ready
+                    if button_due:
                         try:
                             button_task = asyncio.create_task(self.check_buttons())
                             tasks.add(button_task)
                             res = await button_task
+
+                            if res == 'push_to_talk':
+                                # The press came after the previous poll; latency and the question start there
+                                self.ptt_pressed_at = last_button_check_time
+                                self.question_start_index = last_button_check_index
+                                metrics.increment('ptt.presses')
+                                await self.presence.note_activity(reason="button")
+                                return True, WakeWordType.PUSH_TO_TALK
                             
                             if res == 'exit':
                                 try:
                                     if self.audio_stream:
-                                        self.audio_stream.stop_stream()
+                                        self.audio_stream.pause()
                                     await asyncio.sleep(0.1)  
 
                                     exit_task = asyncio.create_task(
@@ -277,11 +276,12 @@ class WakeWord:
                                     await asyncio.sleep(0.1)  
 
                                     if self.audio_stream:
-                                        self.audio_stream.start_stream()
+                                        self.audio_stream.resume()
                                 except Exception as e:
                                     wakeword_logger.error(f"Error at button exit audio and display task: {e}")
                             
                             last_button_check_time = current_time
+                            last_button_check_index = current_index
                         except KeyboardInterrupt:
                             raise
                         except Exception as e:
@@ -289,12 +289,49 @@ class WakeWord:
 
                     if is_exit_event_set():
                         raise KeyboardInterrupt
-                    
-                    # Check for wake word
-                    if await self.check_for_wake_word(frames):
+
+                    if not window_ready:
+                        continue
+
+                    try:
+                        await self.presence.poll()
+                    except Exception as e:
+                        wakeword_logger.error(f"Error polling motion sensor: {e}")
+
+                    if self.presence.idle != was_idle:
+                        if self.presence.idle and idle_gate:
+                            # Only speech from here on counts, not what the gate saw while active
+                            idle_gate.reset()
+                        if not self.presence.idle:
+                            # Nothing heard while idle may count as a wake word
+                            detector.reset()
+                        if isinstance(self.microphone, ProcessMicrophoneBus):
+                            self.microphone.pause_engine(self.presence.idle)
+                    was_idle = self.presence.idle
+
+                    if self.presence.idle:
+                        # Low-cost path: local energy only, speech brings full detection back
+                        if idle_gate is None or idle_gate.allows():
+                            await self.presence.note_activity(reason="speech energy")
+                        await asyncio.sleep(self.engine.loop_delay)
+                        continue
+
+                    keyword = await detector.detect(end_index=self.audio_stream.position)
+                    wake_word_end_index = detector.keyword_end_index
+
+                    if keyword and keyword.action != WakeWordType.TRIGGER:
+                        # Command keywords act straight away, without the acknowledgement sound
+                        return True, keyword.action
+
+                    if keyword:
+                        if not self.acknowledge_wake_word:
+                            # Whatever was said after the wake word is already on the bus
+                            self.question_start_index = wake_word_end_index
+                            return True, WakeWordType.TRIGGER
+
                         try:
                             if self.audio_stream:
-                                self.audio_stream.stop_stream()
+                                self.audio_stream.pause()
                             await asyncio.sleep(0.1)
 
                             for attempt in range(3):
@@ -311,7 +348,9 @@ class WakeWord:
                                         await asyncio.sleep(0.1)
 
                             await asyncio.sleep(0.1)
-                            
+
+                            # Start the question right after the acknowledgement, not when recording opens
+                            self.question_start_index = self.microphone.position
                             return True, WakeWordType.TRIGGER
                         except asyncio.TimeoutError:
                             wakeword_logger.error("Response audio playback timed out")
@@ -319,13 +358,15 @@ class WakeWord:
                             wakeword_logger.error(f"Error playing response audio: {e}")
                         finally:
                             if self.audio_stream:
-                                self.audio_stream.start_stream()
+                                self.audio_stream.resume()
 
-                    frames = []
-                    await asyncio.sleep(0.1)
+                    # Frame-by-frame engines read one short frame per pass, so only yield to the loop
+                    await asyncio.sleep(self.engine.loop_delay)
 
                 except IOError as e:
                     wakeword_logger.error(f"Error reading audio stream: {e}")
+                    if self.audio_stream is None or self.audio_stream.closed:
+                        return False, WakeWordType.OTHER
                     await asyncio.sleep(0.1)
                     continue
                 except KeyboardInterrupt:
@@ -348,6 +389,12 @@ class WakeWord:
             return False, WakeWordType.OTHER
         finally:
             try:
+                if isinstance(self.microphone, ProcessMicrophoneBus):
+                    # The reply's stop listener and the next loop need the child's engine
+                    self.microphone.pause_engine(False)
+                if detector:
+                    await detector.stop()
+
                 for task in tasks:
                     if not task.done():
                         task.cancel()
@@ -366,32 +413,14 @@ class WakeWord:
         async with self._cleanup_lock:
             if self.audio_stream:
                 try:
-                    self.audio_stream.stop_stream()
                     self.audio_stream.close()
                     self.audio_stream = None
                 except Exception as e:
-                    wakeword_logger.error(f"Error stopping audio stream: {e}")
-
-            if self.pyaudio_instance:
-                try:
-                    self.pyaudio_instance.terminate()
-                    self.pyaudio_instance = None
-                except Exception as e:
-                    wakeword_logger.error(f"Error terminating PyAudio: {e}")
+                    wakeword_logger.error(f"Error closing microphone subscription: {e}")
 
     def __del__(self):
-        if self.audio_stream or self.pyaudio_instance:
-            if asyncio.get_event_loop().is_running():
-                asyncio.create_task(self.cleanup_recorder())
-            else:
-                if self.audio_stream:
-                    try:
-                        self.audio_stream.stop_stream()
-                        self.audio_stream.close()
-                    except:
-                        pass
-                if self.pyaudio_instance:
-                    try:
-                        self.pyaudio_instance.terminate()
-                    except:
-                        pass
\ No newline at end of file
+        if self.audio_stream:
+            try:
+                self.audio_stream.close()
+            except:
+                pass
\ No newline at end of file
@@ -0,0 +1,82 @@
+from utils import metrics
+
+import asyncio
+import logging
+import numpy as np
+import time
+
+logging.basicConfig(level=logging.INFO)
+worker_logger = logging.getLogger(__name__)
+
+class RecognitionWorker:
+    """Verifies nominated wake word windows off the capture path
+
+    submit() copies the window out of the ring buffer into a bounded queue and
+    returns immediately, so the microphone keeps being read while requests are
+    in flight. When the queue is full the oldest window is dropped, since a
+    newer overlapping window covers the same audio.
+    """
+    def __init__(self, check, max_pending=2, concurrency=2):
+        self.check = check  # async callable(window, candidate) -> WakeKeyword or None
+        self.queue = asyncio.Queue(maxsize=max_pending)
+        self.concurrency = concurrency
+        self.detected = asyncio.Event()
+        self.detected_index = None  # Bus sample index at the end of the confirmed window
+        self.keyword_end_index = None  # Bus sample index the confirmed keyword is estimated to end at
+        self.detected_keyword = None
+        self._tasks = []
+
+    def start(self):
+        self.detected.clear()
+        self.detected_index = None
+        self.keyword_end_index = None
+        self.detected_keyword = None
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.concurrency)]
+
+    def reset(self):
+        """Clear a previous detection so the worker can be reused"""
+        self.detected.clear()
+        self.detected_index = None
+        self.keyword_end_index = None
+        self.detected_keyword = None
+
+    def submit(self, window, end_index=None, candidate=True, keyword_end=None):
+        if self.queue.full():
+            try:
+                self.queue.get_nowait()
+                self.queue.task_done()
+                metrics.increment('wakeword.windows_dropped')
+            except asyncio.QueueEmpty:
+                pass
+        self.queue.put_nowait((np.array(window, copy=True), end_index, keyword_end, candidate, time.monotonic()))
+        metrics.increment('wakeword.windows_submitted')
+
+    async def _run(self):
+        while True:
+            window, end_index, keyword_end, candidate, submitted_at = await self.queue.get()
+            try:
+                keyword = None if self.detected.is_set() else await self.check(window, candidate)
+                if keyword and not self.detected.is_set():
+                    self.detected_keyword = keyword
+                    self.detected_index = end_index
+                    self.keyword_end_index = keyword_end if keyword_end is not None else end_index
+                    self.detected.set()
+                metrics.observe('wakeword.recognition_ms', (time.monotonic() - submitted_at) * 1000)
+            except Exception as e:
+                worker_logger.error(f"Error in recognition worker: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await asyncio.wait_for(task, timeout=1.0)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                pass
+        self._tasks = []
+
+        while not self.queue.empty():
+            self.queue.get_nowait()
+            self.queue.task_done()